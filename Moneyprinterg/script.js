@@ -75,7 +75,68 @@
     observer.observe(el);
   });
 
-  // Dynamic music grid from covers folder
+  // Root-level resources (covers/, site-data/, events.json) sit one level up while
+  // developing; the built site puts them next to the pages and sets data-root=""
+  const ROOT_URL = document.documentElement.dataset.root ?? '../';
+
+  // Cover image; wraps it in <picture> with AVIF/WebP sources when the build
+  // provides responsive variants (see cover_variants.py / build_discography.py)
+  const coverImage = (src, alt, variants) => {
+    const img = document.createElement('img');
+    img.src = src;
+    img.alt = alt;
+    img.loading = 'lazy';
+    img.decoding = 'async';
+    if (!variants) return img;
+    const rebase = (srcset) => srcset.split(', ').map((s) => `${ROOT_URL}${s}`).join(', ');
+    const picture = document.createElement('picture');
+    (variants.sources || []).forEach((s) => {
+      const source = document.createElement('source');
+      source.type = s.type;
+      source.srcset = rebase(s.srcset);
+      if (variants.sizes) source.sizes = variants.sizes;
+      picture.appendChild(source);
+    });
+    if (variants.srcset) {
+      img.srcset = rebase(variants.srcset);
+      if (variants.sizes) img.sizes = variants.sizes;
+    }
+    picture.appendChild(img);
+    return picture;
+  };
+
+  // Site data precomputed by build_discography.py (site-data/): a small index
+  // for the grids, per-track detail shards fetched lazily, and events. Each
+  // file is fetched at most once per page. Pages with <html data-site-data="bundle">
+  // instead read everything from the hashed bundle named in index.json, which
+  // browsers keep cached until the catalog changes.
+  const SITE_DATA_DIR = `${ROOT_URL}site-data/`;
+  const USE_BUNDLE = document.documentElement.dataset.siteData === 'bundle';
+  const pending = {};
+  const once = (key, load) => pending[key] || (pending[key] = load());
+  const fetchJSON = (url) => fetch(url).then((r) => {
+    if (!r.ok) throw new Error(`${url}: ${r.status}`);
+    return r.json();
+  });
+  const fetchIndex = () => fetchJSON(`${SITE_DATA_DIR}index.json`);
+  const loadBundle = () => once('bundle', () => fetchIndex().then((index) => fetchJSON(SITE_DATA_DIR + index.bundle)));
+  const loadIndex = () => once('index', () => (USE_BUNDLE ? loadBundle() : fetchIndex()));
+  const loadTrackDetail = (track) => once(`track:${track.id}`, () => (USE_BUNDLE
+    ? loadBundle().then((b) => b.details[track.id])
+    : fetchJSON(SITE_DATA_DIR + track.detail)));
+  const loadEvents = () => once('events', () => (USE_BUNDLE
+    ? loadBundle().then((b) => b.events || [])
+    : fetchJSON(`${ROOT_URL}events.json`).then((d) => d.events || [])));
+  const upcomingEvents = () => loadEvents().then((all) => {
+    const events = all.filter((e) => e.date && new Date(e.date) >= new Date());
+    events.sort((a, b) => new Date(a.date) - new Date(b.date));
+    return events;
+  });
+  const youtubeSearch = (title) => `https://www.youtube.com/results?search_query=${encodeURIComponent('MoneyPrinter G ' + title)}`;
+  const spotifySearch = (title) => `https://open.spotify.com/search/${encodeURIComponent('MoneyPrinter G ' + title)}`;
+  const appleSearch = (title) => `https://music.apple.com/us/search?term=${encodeURIComponent('MoneyPrinter G ' + title)}`;
+
+  // Music grid on Home: curated cover order, links pre-joined in the site-data index
   const musicGrid = document.getElementById('music-grid');
   if (musicGrid) {
     const files = [
@@ -99,11 +160,6 @@
       'Y_U_mad_mpg.png'
     ];
 
-    const norm = (s) => s.toLowerCase()
-      .replace(/\.(png|jpeg|jpg)$/i, '')
-      .replace(/_mpg$/i, '')
-      .replace(/[^a-z0-9]+/g, '');
-
     const titleFromFile = (name) => {
       const base = name.replace(/\.(png|jpeg|jpg)$/i, '')
                        .replace(/_mpg$/i, '')
@@ -111,25 +167,19 @@
       return base.replace(/\b(\w)/g, (m) => m.toUpperCase());
     };
 
-    // Fetch direct links mapping from links.json
-    fetch('../links.json')
-      .then((r) => r.json())
-      .then((data) => {
-        const map = {};
-        (data.links || []).forEach((entry) => {
-          if (entry && entry.title && entry.final_url) {
-            map[norm(entry.title)] = entry.final_url;
-          }
-        });
+    loadIndex()
+      .then((index) => {
+        const byCover = {};
+        (index.tracks || []).forEach((t) => { byCover[t.cover] = t; });
 
         const items = files.map((f) => {
-          const key = norm(f);
-          const direct = map[key];
-          const fallback = `https://www.youtube.com/results?search_query=${encodeURIComponent('MoneyPrinter G ' + titleFromFile(f))}`;
+          const track = byCover[`covers/${f}`];
+          const title = track ? track.title : titleFromFile(f);
           return {
-            title: titleFromFile(f),
-            img: `../covers/${f}`,
-            link: direct || fallback,
+            title,
+            img: `${ROOT_URL}covers/${f}`,
+            variants: track && track.coverVariants,
+            link: (track && track.youtube) || youtubeSearch(title),
             platform: 'YouTube'
           };
         });
@@ -141,12 +191,7 @@
 
           const cover = document.createElement('div');
           cover.className = 'cover';
-          const img = document.createElement('img');
-          img.src = item.img;
-          img.alt = item.title + ' cover';
-          img.loading = 'lazy';
-          img.decoding = 'async';
-          cover.appendChild(img);
+          cover.appendChild(coverImage(item.img, item.title + ' cover', item.variants));
 
           const h3 = document.createElement('h3');
           h3.textContent = item.title;
@@ -188,24 +233,33 @@
   // Discography page rendering
   const discographyList = document.getElementById('discography-list');
   if (discographyList) {
-    fetch('../discography.json')
-      .then((r) => r.json())
-      .then((data) => {
-        const tracks = (data.tracks || []).slice();
-        // Already sorted chronologically in build script; ensure any null dates at end
+    const creditsText = (c) => `Artist: ${c.artist} • Producer: ${c.producer} • Label: ${c.label}`;
+    loadIndex()
+      .then((index) => {
+        const shared = index.shared || {};
+        // Tracks arrive in release-date order (null dates last); the few tracks whose
+        // credits or Hyperfollow link differ from `shared` have a detail shard, fetched
+        // as their card approaches the viewport
+        const fillDetail = (t, hyperfollow, credits) => loadTrackDetail(t).then((d) => {
+          if (d.hyperfollow) hyperfollow.href = d.hyperfollow;
+          if (d.credits) credits.textContent = creditsText(d.credits);
+        }).catch(() => {});
+        const detailObs = new IntersectionObserver((entries) => {
+          entries.forEach((entry) => {
+            if (!entry.isIntersecting) return;
+            detailObs.unobserve(entry.target);
+            entry.target.__loadDetail();
+          });
+        }, { rootMargin: '200px' });
+
         const frag = document.createDocumentFragment();
-        tracks.forEach((t) => {
+        (index.tracks || []).forEach((t) => {
           const card = document.createElement('article');
           card.className = 'card';
 
           const cover = document.createElement('div');
           cover.className = 'cover';
-          const img = document.createElement('img');
-          img.src = `../${t.cover}`;
-          img.alt = `${t.title} cover`;
-          img.loading = 'lazy';
-          img.decoding = 'async';
-          cover.appendChild(img);
+          cover.appendChild(coverImage(`${ROOT_URL}${t.cover}`, `${t.title} cover`, t.coverVariants));
 
           const h3 = document.createElement('h3');
           h3.textContent = t.title;
@@ -220,24 +274,25 @@
           const y = document.createElement('a');
           y.className = 'btn btn-primary';
           // Fallback: if per-track YouTube link is missing, use a search query
-          const ytSearch = `https://www.youtube.com/results?search_query=${encodeURIComponent('MoneyPrinter G ' + t.title)}`;
-          y.href = t.platforms.youtube || ytSearch;
+          y.href = t.youtube || youtubeSearch(t.title);
           y.target = '_blank'; y.rel = 'noopener noreferrer';
           y.textContent = 'YouTube';
 
           const sp = document.createElement('a');
           sp.className = 'btn btn-outline';
-          sp.href = t.platforms.spotify; sp.target = '_blank'; sp.rel = 'noopener noreferrer';
+          sp.href = spotifySearch(t.title);
+          sp.target = '_blank'; sp.rel = 'noopener noreferrer';
           sp.textContent = 'Spotify';
 
           const ap = document.createElement('a');
           ap.className = 'btn btn-outline';
-          ap.href = t.platforms.apple; ap.target = '_blank'; ap.rel = 'noopener noreferrer';
+          ap.href = appleSearch(t.title);
+          ap.target = '_blank'; ap.rel = 'noopener noreferrer';
           ap.textContent = 'Apple Music';
 
           const hf = document.createElement('a');
           hf.className = 'btn btn-outline';
-          hf.href = t.platforms.hyperfollow; hf.target = '_blank'; hf.rel = 'noopener noreferrer';
+          hf.href = shared.hyperfollow; hf.target = '_blank'; hf.rel = 'noopener noreferrer';
           hf.textContent = 'Hyperfollow';
 
           actions.appendChild(y);
@@ -249,8 +304,7 @@
           const credits = document.createElement('div');
           credits.style.color = 'var(--color-muted)';
           credits.style.fontSize = '14px';
-          const cText = `Artist: ${t.credits.artist} • Producer: ${t.credits.producer} • Label: ${t.credits.label}`;
-          credits.textContent = cText;
+          credits.textContent = shared.credits ? creditsText(shared.credits) : '';
 
           card.appendChild(cover);
           card.appendChild(h3);
@@ -258,6 +312,10 @@
           card.appendChild(actions);
           card.appendChild(credits);
 
+          if (t.detail) {
+            card.__loadDetail = () => fillDetail(t, hf, credits);
+            detailObs.observe(card);
+          }
           frag.appendChild(card);
         });
         discographyList.appendChild(frag);
@@ -272,11 +330,8 @@
   // Events teaser on Home
   const teaser = document.getElementById('event-teaser');
   if (teaser) {
-    fetch('../events.json')
-      .then((r) => r.json())
-      .then((data) => {
-        const events = (data.events || []).filter((e) => e.date && new Date(e.date) >= new Date());
-        events.sort((a, b) => new Date(a.date) - new Date(b.date));
+    upcomingEvents()
+      .then((events) => {
         const next = events[0];
         if (!next) return;
         const titleEl = teaser.querySelector('.event-title');
@@ -297,11 +352,8 @@
   // Full Events page rendering
   const eventsList = document.getElementById('events-list');
   if (eventsList) {
-    fetch('../events.json')
-      .then((r) => r.json())
-      .then((data) => {
-        const events = (data.events || []).filter((e) => e.date && new Date(e.date) >= new Date());
-        events.sort((a, b) => new Date(a.date) - new Date(b.date));
+    upcomingEvents()
+      .then((events) => {
         const frag = document.createDocumentFragment();
         const ld = [];
         events.forEach((e) => {
@@ -416,14 +468,8 @@
     const searchInputs = Array.from(document.querySelectorAll('.search input[type="search"]'));
     if (searchInputs.length) {
       let dataset = [];
-      Promise.all([
-        fetch('../discography.json').then((r) => r.ok ? r.json() : { tracks: [] }).catch(() => ({ tracks: [] })),
-        fetch('../links.json').then((r) => r.ok ? r.json() : { links: [] }).catch(() => ({ links: [] }))
-      ]).then(([discog, links]) => {
-        const titles = (discog.tracks || []).map((t) => ({ label: t.title, url: (t.platforms && t.platforms.youtube) || '#' }));
-        const more = (links.links || []).map((l) => ({ label: l.title, url: l.final_url || l.url || '#' }));
-        dataset = titles.concat(more);
-      });
+      // Suggestions (track titles, then checked links) are precomputed in the site-data index
+      loadIndex().then((index) => { dataset = index.search || []; }).catch(() => {});
 
       searchInputs.forEach((input) => {
         const list = input.parentElement.querySelector('.search-suggestions');
@@ -0,0 +1,137 @@
+"""Synthetic catalogs for the benchmarks.
+
+A catalog is a self-contained copy of the project layout (covers/, the link
+list, links.json, events.json, the site and build inputs, and an mpg.json
+rooted there) with N generated covers: mixed PNG/JPEG, RGBA, with and without
+an embedded ICC profile, and a spread of sizes from YouTube thumbnails to large
+masters. Covers are generated
+once per (size, seed) and reused; each benchmark run works on a fresh copy.
+"""
+import json
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image, ImageDraw
+try:
+    from PIL import ImageCms
+    SRGB_ICC = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+except Exception:
+    SRGB_ICC = None
+
+ROOT = Path(__file__).resolve().parents[1]
+LINK_FILE_NAME = "MoneyPrinter G link.txt"
+# Copied into every catalog so build.main has real inputs
+PROJECT_FILES = ("team-fullstack.txt", "MoneyPrinter G Official Fan Website.md", "events.json")
+SITE_DIR_NAME = "Moneyprinterg"
+CONFIG_NAME = "mpg.json"  # default layout, rooted at the catalog
+
+# (width, height) choices: thumbnails that need upscaling, square covers, 16:9 frames, big masters
+SIZES = ((180, 180), (336, 188), (500, 500), (640, 360), (1000, 1000), (1280, 720), (1600, 1600), (2400, 2400))
+JPEG_SHARE = 0.4
+RGBA_SHARE = 0.1
+ICC_SHARE = 0.5
+DEAD_LINK_SHARE = 0.05  # links the stub server answers with 404
+DUPLICATE_LINK_SHARE = 0.05  # entries that repeat an earlier URL
+
+
+def cover_name(i):
+    return f"Bench_Track_{i:04d}_mpg"
+
+
+def _render(args):
+    i, seed, out_dir = args
+    rng = random.Random(seed * 100003 + i)
+    w, h = rng.choice(SIZES)
+    mode = "RGBA" if rng.random() < RGBA_SHARE else "RGB"
+    # Smooth gradients plus noise: photo-like enough to make encoders work, cheap to draw
+    r = Image.linear_gradient("L").rotate(rng.randrange(360)).resize((w, h))
+    g = Image.radial_gradient("L").resize((w, h))
+    b = Image.effect_noise((w, h), rng.uniform(10, 60))
+    img = Image.merge("RGB", (r, g, b))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x0, y0 = rng.randrange(w), rng.randrange(h)
+        draw.ellipse((x0, y0, x0 + rng.randrange(20, max(21, w // 3)), y0 + rng.randrange(20, max(21, h // 3))),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    if mode == "RGBA":
+        img.putalpha(Image.radial_gradient("L").resize((w, h)))
+    icc = SRGB_ICC if SRGB_ICC and rng.random() < ICC_SHARE else None
+    extra = {"icc_profile": icc} if icc else {}
+    if mode == "RGB" and rng.random() < JPEG_SHARE:
+        path = Path(out_dir) / f"{cover_name(i)}.jpg"
+        img.save(path, "JPEG", quality=rng.choice((85, 92, 95)), **extra)
+    else:
+        path = Path(out_dir) / f"{cover_name(i)}.png"
+        img.save(path, "PNG", compress_level=1, **extra)
+    return path.name, (w, h), mode, bool(icc)
+
+
+def generate_covers(count, seed, out_dir, workers=None):
+    """Render `count` covers into out_dir in parallel; returns a summary of what was made."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        made = list(pool.map(_render, [(i, seed, str(out_dir)) for i in range(count)], chunksize=8))
+    return {
+        "covers": count,
+        "jpeg": sum(1 for n, *_ in made if n.endswith(".jpg")),
+        "rgba": sum(1 for *_, m, _ in made if m == "RGBA"),
+        "icc": sum(1 for *_, icc in made if icc),
+        "bytes": sum(p.stat().st_size for p in out_dir.iterdir() if p.is_file()),
+        "files": [n for n, *_ in made],
+    }
+
+
+def link_entries(files, seed, base_url):
+    """One link per cover, titled with the cover's file name.
+
+    build_discography joins links to covers on the normalized file name,
+    extension included, so this is the title form that matches.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for i, name in enumerate(files):
+        if entries and rng.random() < DUPLICATE_LINK_SHARE:
+            url = rng.choice(entries)["url"]
+        elif rng.random() < DEAD_LINK_SHARE:
+            url = f"{base_url}/missing?v=dead{i:04d}"
+        else:
+            url = f"{base_url}/watch?v=vid{i:04d}"
+        entries.append({"title": name, "url": url})
+    return entries
+
+
+def write_links(ws, entries):
+    """The link list file in its canonical layout and a matching links.json."""
+    blocks = [f"{e['title']}\n{e['url']}\nStatus: OK\n" for e in entries]
+    (ws / LINK_FILE_NAME).write_text("\n".join(blocks), encoding="utf-8")
+    links = [{**e, "ok": True, "status": 200, "final_url": e["url"]} for e in entries]
+    (ws / "links.json").write_text(json.dumps({"updatedAt": None, "links": links}, indent=2), encoding="utf-8")
+
+
+def pristine_covers(cache_dir, count, seed):
+    """Generated covers for (count, seed), rendered on first use."""
+    target = Path(cache_dir) / f"covers-{count}-{seed}"
+    done = target / ".complete.json"
+    if not done.exists():
+        shutil.rmtree(target, ignore_errors=True)
+        summary = generate_covers(count, seed, target)
+        done.write_text(json.dumps(summary), encoding="utf-8")
+    return target, json.loads(done.read_text(encoding="utf-8"))
+
+
+def make_workspace(ws, cache_dir, count, seed, base_url):
+    """Fresh catalog directory for one benchmark run; returns its cover summary."""
+    ws = Path(ws)
+    shutil.rmtree(ws, ignore_errors=True)
+    covers, summary = pristine_covers(cache_dir, count, seed)
+    shutil.copytree(covers, ws / "covers", ignore=shutil.ignore_patterns(".complete.json"))
+    for name in PROJECT_FILES:
+        if (ROOT / name).exists():
+            shutil.copy2(ROOT / name, ws / name)
+    shutil.copytree(ROOT / SITE_DIR_NAME, ws / SITE_DIR_NAME)
+    write_links(ws, link_entries(summary["files"], seed, base_url))
+    (ws / CONFIG_NAME).write_text(json.dumps({"root": "."}, indent=2), encoding="utf-8")
+    return summary
+
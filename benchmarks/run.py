@@ -0,0 +1,280 @@
+"""Benchmark the real pipeline entry points against synthetic catalogs.
+
+    python benchmarks/run.py                          # 10/100/1000 covers, every stage
+    python benchmarks/run.py --sizes 10,100 --stages resize_covers,build --repeat 3
+    python benchmarks/run.py --compare old.json new.json --threshold 0.15
+
+Per catalog size the stages run in pipeline order on a fresh catalog (see
+catalog.py), each in its own spawned process so peak RSS is per stage. Link
+and publish-date traffic goes to a local stub server (stub_server.py). The
+results JSON has wall/CPU time, throughput, per-item latency percentiles
+(from perf_trace item spans), HTTP latency and peak memory. --compare flags
+regressions between two result files and exits non-zero if there are any.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "build"))
+
+import catalog  # noqa: E402
+import project_config  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+# Pipeline order: each stage consumes what the previous ones wrote
+STAGES = ("verify_links", "build_discography", "process_covers", "resize_covers", "build")
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_LATENCY_MS = 20
+DEFAULT_THRESHOLD = 0.15  # relative change that counts as a regression
+WORK_DIR = ROOT / ".cache" / "benchmarks"
+# (metric path, True if higher is better)
+COMPARE_METRICS = (
+    ("wall_ms", False),
+    ("throughput_per_s", True),
+    ("latency_ms.p95", False),
+    ("peak_rss_kb", False),
+)
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * (len(values) - 1) + 0.5))], 3)
+    return {"count": len(values), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 3)}
+
+
+def _run_stage(stage, ws):
+    """Call one entry point on the catalog in `ws`; returns its item count."""
+    # The catalog's mpg.json points every path at the workspace. The HTTP cache is
+    # switched off outright, so lookups stay cold even if the workspace's .cache/ is warm
+    config = project_config.use(ws / catalog.CONFIG_NAME)
+    if stage == "verify_links":
+        import verify_and_update_links
+        verify_and_update_links.main(["--deadline", "0", "--no-cache"])
+        return len(json.loads(config.path_for("links_json").read_text(encoding="utf-8"))["links"])
+    if stage == "build_discography":
+        import build_discography
+        from http_cache import HttpCache
+        build_discography.build(cache=HttpCache(enabled=False))
+        return len(json.loads(config.path_for("discography").read_text(encoding="utf-8"))["tracks"])
+    if stage == "process_covers":
+        import process_covers
+        process_covers.main([])
+        return len(json.loads(process_covers.METADATA_JSON.read_text(encoding="utf-8"))["covers"])
+    if stage == "resize_covers":
+        import resize_covers
+        resize_covers.main(["--jobs", "0"])
+        with open(resize_covers.REPORT_PATH, encoding="utf-8") as f:
+            return json.load(f)["summary"]["total"]
+    if stage == "build":
+        import build
+        build.main(["--release"])
+        return sum(1 for p in (config.path_for("dist") / "site").rglob("*") if p.is_file())
+    raise ValueError(f"unknown stage: {stage}")
+
+
+def _cpu_seconds():
+    """CPU time of this process plus reaped workers (resize_covers --jobs, cover generation)."""
+    if resource is None:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+    return sum(u.ru_utime + u.ru_stime for u in (resource.getrusage(resource.RUSAGE_SELF),
+                                                  resource.getrusage(resource.RUSAGE_CHILDREN)))
+
+
+def _child(stage, ws, queue):
+    import perf_trace
+    ws = Path(ws)
+    os.environ.pop(perf_trace.TRACE_ENV, None)  # results come back over the queue, not as trace files
+    sys.stdout = open(os.devnull, "w")  # the entry points print progress
+    t0 = time.perf_counter()
+    c0 = _cpu_seconds()
+    items = _run_stage(stage, ws)
+    wall_ms = (time.perf_counter() - t0) * 1000
+    cpu_ms = (_cpu_seconds() - c0) * 1000
+    tracer = perf_trace.TRACER
+    summary = tracer.summary()
+    queue.put({
+        "items": items,
+        "wall_ms": round(wall_ms, 3),
+        "cpu_ms": round(cpu_ms, 3),
+        "throughput_per_s": round(items / (wall_ms / 1000), 3) if wall_ms else None,
+        "latency_ms": _percentiles([ev["wall_ms"] for ev in tracer.events if ev["cat"] == "item"]),
+        "network": {
+            "requests": len(tracer.requests),
+            "latency_ms": _percentiles([r["latency_ms"] for r in tracer.requests]),
+        },
+        "peak_rss_kb": perf_trace.peak_rss_kb(),
+        "bytes": summary["bytes"],
+        "stages": summary["stages"],
+    })
+
+
+def run_stage(stage, ws):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(stage, str(ws), queue))
+    proc.start()
+    try:
+        result = queue.get()
+    finally:
+        proc.join()
+    if proc.exitcode:
+        raise RuntimeError(f"{stage} exited with {proc.exitcode}")
+    return result
+
+
+def _aggregate(runs):
+    """Median of timing/throughput over repeats, worst case for memory and latency."""
+    first = runs[0]
+    if len(runs) == 1:
+        return first
+    med = lambda key: round(statistics.median(r[key] for r in runs), 3)  # noqa: E731
+    return {
+        **first,
+        "wall_ms": med("wall_ms"),
+        "cpu_ms": med("cpu_ms"),
+        "throughput_per_s": med("throughput_per_s"),
+        "latency_ms": max((r["latency_ms"] for r in runs), key=lambda l: l["p95"] or 0),
+        "peak_rss_kb": max(r["peak_rss_kb"] or 0 for r in runs),
+        "repeats": [{k: r[k] for k in ("wall_ms", "cpu_ms", "throughput_per_s")} for r in runs],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, stages, repeat, latency_ms, seed, work_dir):
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    catalogs = {}
+    with StubServer(latency=latency_ms / 1000) as server:
+        for size in sizes:
+            runs = {s: [] for s in stages}
+            for _ in range(repeat):
+                with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+                    ws = Path(tmp) / "catalog"
+                    t0 = time.perf_counter()
+                    summary = catalog.make_workspace(ws, work_dir, size, seed, server.base_url)
+                    catalogs[size] = {k: v for k, v in summary.items() if k != "files"}
+                    print(f"[{size}] catalog ready in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+                    for stage in STAGES:
+                        if stage not in stages:
+                            continue
+                        res = run_stage(stage, ws)
+                        runs[stage].append(res)
+                        print(f"[{size}] {stage}: {res['wall_ms']:.0f} ms, {res['items']} items, "
+                              f"{res['throughput_per_s']}/s, peak {res['peak_rss_kb']} KiB", file=sys.stderr)
+            for stage in stages:
+                results.append({"stage": stage, "size": size, **_aggregate(runs[stage])})
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": list(sizes),
+            "stages": [s for s in STAGES if s in stages],
+            "repeat": repeat,
+            "stub_latency_ms": latency_ms,
+            "seed": seed,
+            "catalogs": catalogs,
+        },
+        "results": results,
+    }
+
+
+def _metric(res, path):
+    value = res
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    """Rows of (stage, size, metric, old, new, change, regressed) for results present in both runs."""
+    old_by = {(r["stage"], r["size"]): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        base = old_by.get((r["stage"], r["size"]))
+        if not base:
+            continue
+        for path, higher_is_better in COMPARE_METRICS:
+            a, b = _metric(base, path), _metric(r, path)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            worse = -change if higher_is_better else change
+            rows.append((r["stage"], r["size"], path, a, b, change, worse > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"{'stage':<18} {'size':>5} {'metric':<17} {'old':>12} {'new':>12} {'change':>8}")
+    for stage, size, metric, a, b, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{stage:<18} {size:>5} {metric:<17} {a:>12.1f} {b:>12.1f} {change:>+7.1%}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline entry points on synthetic catalogs")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated cover counts")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size; timings report the median")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="stub server response delay")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--work-dir", default=str(WORK_DIR), help="catalog cache and scratch space")
+    parser.add_argument("--out", help="results JSON (default: <work-dir>/results-<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change flagged as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        old, new = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        if print_comparison(compare(old, new, args.threshold), args.threshold):
+            sys.exit(1)
+        return
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run(sizes, stages, max(1, args.repeat), args.latency_ms, args.seed, args.work_dir)
+    out = Path(args.out) if args.out else Path(args.work_dir) / time.strftime("results-%Y%m%dT%H%M%S.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
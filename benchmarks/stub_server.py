@@ -0,0 +1,153 @@
+"""Local stand-in for YouTube watch pages and link targets (benchmarks and tests/).
+
+/watch?v=<id>    200, a watch-page-sized HTML document with the publish date
+                 buried PAGE_PADDING bytes in (so streaming scans are exercised)
+/missing?...     404
+/redirect?to=/p  302 to /p
+/flaky?id=&fail=N&status=503
+                 `status` (429 or 5xx, with Retry-After: 0) for the first N
+                 requests with that id, then 200
+/error?...       500, every time
+/slow?s=<sec>    200 after an extra `sec` seconds
+anything else    200, tiny body
+
+Every response waits `latency` seconds first to model a remote host. The
+server counts requests per path and the most requests it served at once.
+"""
+import hashlib
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PAGE_PADDING = 256 * 1024
+PAGE_TAIL = 512 * 1024  # rest of the page after the date, never read by a streaming scan
+
+
+def publish_date(video_id):
+    # Stable per video id so runs are comparable
+    n = int(hashlib.sha1(video_id.encode("utf-8")).hexdigest()[:8], 16)
+    return f"20{18 + n % 7}-{1 + n % 12:02d}-{1 + n % 28:02d}"
+
+
+def watch_page(video_id):
+    filler = b"<!-- " + b"x" * 1000 + b" -->\n"
+    head = b"<!DOCTYPE html><html><head><title>" + video_id.encode("utf-8") + b"</title>\n"
+    body = filler * (PAGE_PADDING // len(filler))
+    meta = f'<meta itemprop="datePublished" content="{publish_date(video_id)}">\n'.encode("utf-8")
+    tail = filler * (PAGE_TAIL // len(filler))
+    return head + body + meta + tail + b"</head><body></body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+
+    def _respond(self, send_body):
+        self.server.enter()
+        try:
+            self._reply(send_body)
+        finally:
+            self.server.leave()
+
+    def _reply(self, send_body):
+        time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        arg = lambda name, default: query.get(name, [default])[0]  # noqa: E731
+        headers = {}
+        if parts.path == "/flaky":
+            key = "/flaky?id=" + arg("id", "")
+            hits = self.server.count(key)
+            if hits <= int(arg("fail", "1")):
+                headers["Retry-After"] = "0"
+                status, body = int(arg("status", "503")), b"try again"
+            else:
+                status, body = 200, b"ok"
+        else:
+            self.server.count(parts.path)
+            if parts.path.startswith("/missing"):
+                status, body = 404, b"not found"
+            elif parts.path == "/watch":
+                status, body = 200, watch_page(arg("v", "unknown"))
+            elif parts.path == "/redirect":
+                headers["Location"] = arg("to", "/")
+                status, body = 302, b""
+            elif parts.path == "/error":
+                headers["Retry-After"] = "0"
+                status, body = 500, b"server error"
+            elif parts.path == "/slow":
+                time.sleep(float(arg("s", "1")))
+                status, body = 200, b"ok"
+            else:
+                status, body = 200, b"ok"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Streaming clients hang up once they have the date
+                self.close_connection = True
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.02, host="127.0.0.1", port=0):
+        super().__init__((host, port), StubHandler)
+        self.latency = latency
+        self.requests = 0
+        self.hits = {}  # path (or flaky id) -> requests
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count(self, key):
+        """Count one request for `key`; returns how many it has had."""
+        with self._lock:
+            self.requests += 1
+            self.hits[key] = self.hits.get(key, 0) + 1
+            return self.hits[key]
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def handle_error(self, request, client_address):
+        # Clients drop keep-alive connections when their process exits; that's not a failure
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
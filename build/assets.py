@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import re
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# 需要预压缩的文本类型；太小的文件压缩后收益可以忽略
+COMPRESS_EXTS = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".md"}
+COMPRESS_MIN_BYTES = 512
+FINGERPRINT_LEN = 10
+# 改动压缩/改写规则时递增，使增量构建重新生成全部资源
+PIPELINE_VERSION = 1
+
+_CSS_TOKENS = re.compile(r"""/\*.*?\*/|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|\s+|[^"'/\s]+|/""", re.S)
+# 这些字符之后 / 之前的空白可以删除；选择器中 ":" 前、calc() 中 "+" 两侧以及 "(" 前的空白有语义，保留
+_CSS_TIGHT_AFTER = set("{}:;,>(")
+_CSS_TIGHT_BEFORE = set("{};,>)!")
+# 正则字面量只可能出现在这些字符或关键字之后，其余位置的 / 是除号
+_JS_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_JS_REGEX_KEYWORDS = re.compile(r"(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|void|yield)$")
+_JS_TIGHT = set("{}()[];,:=<>?&|!")
+_HTML_RAW = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+_HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+
+
+def minify_css(text):
+    """去掉注释并压缩空白；字符串原样保留。"""
+    out = []
+    for tok in _CSS_TOKENS.findall(text):
+        if tok.startswith("/*"):
+            continue
+        if tok.isspace():
+            prev = out[-1][-1] if out else ""
+            if prev and prev not in _CSS_TIGHT_AFTER and prev != " ":
+                out.append(" ")
+            continue
+        if out and out[-1] == " " and tok[0] in _CSS_TIGHT_BEFORE:
+            out.pop()
+        if tok[0] == "}" and out and out[-1] == ";":
+            out.pop()
+        out.append(tok)
+    return "".join(out).strip() + "\n"
+
+
+def _regex_allowed(last_code):
+    return (not last_code or last_code[-1] in _JS_REGEX_AFTER
+            or _JS_REGEX_KEYWORDS.search(last_code) is not None)
+
+
+def _scan_js(text):
+    """把 JS 切成 (类型, 文本) 片段：code / string / space / comment。
+
+    正确跳过字符串、模板字符串与正则字面量，注释的判定不会误伤它们。
+    """
+    i, n = 0, len(text)
+    last_code = ""
+    while i < n:
+        c = text[i]
+        if c in " \t\r\n":
+            j = i
+            while j < n and text[j] in " \t\r\n":
+                j += 1
+            yield "space", text[i:j]
+            i = j
+        elif text.startswith("//", i):
+            j = text.find("\n", i)
+            j = n if j < 0 else j
+            yield "comment", text[i:j]
+            i = j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            yield "comment", text[i:j]
+            i = j
+        elif c in "'\"`" or (c == "/" and _regex_allowed(last_code)):
+            j = i + 1
+            in_class = False
+            depth = 0  # 模板字符串中 ${...} 的嵌套层数
+            while j < n:
+                d = text[j]
+                if d == "\\":
+                    j += 2
+                    continue
+                if c == "`":
+                    if text.startswith("${", j):
+                        depth += 1
+                    elif d == "}" and depth:
+                        depth -= 1
+                    elif d == "`" and not depth:
+                        break
+                elif c == "/":
+                    if d == "[":
+                        in_class = True
+                    elif d == "]":
+                        in_class = False
+                    elif d == "/" and not in_class:
+                        break
+                    elif d == "\n":
+                        break
+                elif d == c:
+                    break
+                j += 1
+            j += 1
+            if c == "/":
+                while j < n and text[j].isalpha():  # 正则标志
+                    j += 1
+            yield "string", text[i:j]
+            last_code = ")"  # 字符串之后的 / 一定是除号
+            i = j
+        else:
+            j = i + 1
+            while j < n and text[j] not in " \t\r\n'\"`/":
+                j += 1
+            yield "code", text[i:j]
+            last_code = (last_code + text[i:j])[-16:]
+            i = j
+
+
+def minify_js(text):
+    """保守的 JS 压缩：去掉注释与缩进、合并空白，保留换行以免改变自动分号插入。"""
+    out = []
+    for kind, tok in _scan_js(text):
+        if kind in ("comment", "space"):
+            # 注释按空白处理，避免把两侧的标识符粘在一起
+            out.append("\n" if "\n" in tok else " ")
+            continue
+        out.append(tok)
+
+    # 第二遍：删除标点两侧多余的空白与空行
+    merged = []
+    for tok in out:
+        if tok in (" ", "\n"):
+            prev = merged[-1] if merged else ""
+            if not prev or prev in (" ", "\n"):
+                if tok == "\n" and prev == " ":
+                    merged[-1] = "\n"
+                continue
+            if tok == " " and prev[-1] in _JS_TIGHT:
+                continue
+            if tok == "\n" and prev[-1] in "{;,([":
+                continue
+            merged.append(tok)
+            continue
+        if merged and merged[-1] == " " and tok[0] in _JS_TIGHT:
+            merged.pop()
+        merged.append(tok)
+    return "".join(merged).strip() + "\n"
+
+
+def minify_html(text):
+    """去掉注释并合并标签之间的空白；pre/textarea/script/style 的内容不动，style 另做 CSS 压缩。"""
+    parts = _HTML_RAW.split(text)
+    out = []
+    i = 0
+    while i < len(parts):
+        chunk = parts[i]
+        if i % 3 == 0:
+            chunk = _HTML_COMMENT.sub("", chunk)
+            chunk = re.sub(r">\s+<", lambda m: ">\n<" if "\n" in m.group(0) else "> <", chunk)
+            chunk = re.sub(r"\s{2,}", lambda m: "\n" if "\n" in m.group(0) else " ", chunk)
+            out.append(chunk)
+            i += 1
+        else:
+            raw, tag = parts[i], parts[i + 1].lower()
+            if tag == "style":
+                m = re.match(r"(<style\b[^>]*>)(.*?)(</style\s*>)", raw, re.S | re.I)
+                raw = m.group(1) + minify_css(m.group(2)).strip() + m.group(3)
+            out.append(raw)
+            i += 2
+    return "".join(out).strip() + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js, ".html": minify_html}
+
+
+def fingerprint_name(name, data):
+    """styles.css -> styles.<内容哈希>.css"""
+    stem, dot, ext = name.rpartition(".")
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LEN]
+    return f"{stem}.{digest}.{ext}" if dot else f"{name}.{digest}"
+
+
+def rewrite_refs(text, mapping):
+    """把 href/src 与 CSS url() 中的资源名替换为带指纹的文件名。"""
+    if not mapping:
+        return text
+    names = "|".join(re.escape(n) for n in sorted(mapping, key=len, reverse=True))
+    pattern = re.compile(r"""((?:href|src)\s*=\s*["']|url\(\s*["']?)(\./)?(""" + names + r""")(?=[?#"')\s])""")
+    return pattern.sub(lambda m: m.group(1) + mapping[m.group(3)], text)
+
+
+def rebase_parent_refs(text, names):
+    """开发时页面位于 Moneyprinterg/，用 ../ 引用根目录资源；发布时这些资源与页面同级。"""
+    if not names:
+        return text
+    alt = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+    return re.sub(r"""(["'(])\.\./(?=(?:""" + alt + r""")\b)""", r"\1", text)
+
+
+def compress(path):
+    """在文件旁写出 .gz（以及可用时的 .br）；压缩无收益的格式不写。返回写出的路径列表。"""
+    data = path.read_bytes()
+    written = []
+    if len(data) < COMPRESS_MIN_BYTES:
+        return written
+    # mtime=0 让 .gz 内容可复现
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        out = path.with_name(path.name + ".gz")
+        out.write_bytes(gz)
+        written.append(out)
+    if HAS_BROTLI:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            out = path.with_name(path.name + ".br")
+            out.write_bytes(br)
+            written.append(out)
+    return written
+
+
+def pipeline_key(*parts):
+    h = hashlib.sha256(f"assets-v{PIPELINE_VERSION}".encode("utf-8"))
+    for p in parts:
+        h.update(b"\0" + (p if isinstance(p, bytes) else str(p).encode("utf-8")))
+    return h.hexdigest()
+
@@ -1,18 +1,133 @@
 import argparse
+import hashlib
 import json
 import os
 import re
 import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-ROOT = Path(__file__).resolve().parents[1]
-DOC_MD_PATH = ROOT / "MoneyPrinter G Official Fan Website.md"
-TEAM_TXT_PATH = ROOT / "team-fullstack.txt"
-DOCS_DIR = ROOT / "docs"
-CONFIG_DIR = ROOT / "config"
-DIST_DIR = ROOT / "dist"
-SITE_DIR = ROOT / "Moneyprinterg"
+import assets
+from bundle_index import BundleReader, index_bundle
+from release import compute_delta, load_manifest, write_manifest, write_release
+
+# 共享的根目录模块（perf_trace、project_config 等）
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import perf_trace  # noqa: E402
+from project_config import CONFIG  # noqa: E402
+
+# 所有路径来自 mpg.json，与脚本位置和当前工作目录无关
+ROOT = CONFIG.root
+DOC_MD_PATH = CONFIG.path_for("project_doc")
+TEAM_TXT_PATH = CONFIG.path_for("team_bundle")
+DOCS_DIR = CONFIG.path_for("docs")
+CONFIG_DIR = CONFIG.path_for("team_config")
+DIST_DIR = CONFIG.path_for("dist")
+SITE_DIR = CONFIG.path_for("site")
+COVERS_DIR = CONFIG.path_for("covers")
+# 封面备份目录与工具状态文件不发布；近似重复封面由 cover_index.py 的索引决定
+COVER_BACKUP_DIRS = ("_backup_originals", "_backup_resized_originals")
+COVER_STATE_FILES = ("cover_manifest.json", "phash_index.json", "resize_report.json")
+COVER_INDEX_PATH = COVERS_DIR / "phash_index.json"
+DATA_FILES = ["discography.json", "events.json", "links.json"]
+# build_discography.py 生成的站点数据（索引、分片与带内容哈希的合并包）
+SITE_DATA_DIR = CONFIG.path_for("site_data")
+# 资源管线：站点根目录下的 HTML/CSS/JS 压缩后发布，CSS/JS 以内容哈希命名
+ASSET_EXTS = (".html", ".css", ".js")
+FINGERPRINT_EXTS = (".css", ".js")
+# 开发时页面通过 ../ 引用的根目录资源，发布后与页面同级
+SITE_ROOT_NAMES = ["covers", SITE_DATA_DIR.name] + DATA_FILES
+SITE_FILES = ["index.html", "discography.html", "events.html", "styles.css", "script.js"]
+STATE_PATH = CONFIG.path_for("cache") / "build_state.json"
+RELEASE_ZIP = ROOT / "release.zip"
+RELEASE_MANIFEST = ROOT / "release.manifest.json"
+RELEASE_DELTA = ROOT / "release.delta.json"
+STATE_VERSION = 1
+
+
+class BuildState:
+    """增量构建状态：记录输入文件指纹、各步骤结果与 dist 中每个文件的来源指纹。"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.files = {}
+        self.steps = {}
+        self.dist = {}
+        self.assets = {}
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == STATE_VERSION:
+                self.files = data.get("files", {})
+                self.steps = data.get("steps", {})
+                self.dist = data.get("dist", {})
+                self.assets = data.get("assets", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": STATE_VERSION, "files": self.files, "steps": self.steps, "dist": self.dist,
+                   "assets": self.assets}
+        self.path.write_text(json.dumps(payload, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+
+    def fingerprint(self, path):
+        # 先比较 size/mtime，变化时才重新计算内容哈希
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        key = str(path)
+        memo = self.files.get(key)
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.files[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+        return self.files[key]["sha256"]
+
+    def inputs_key(self, paths):
+        h = hashlib.sha256()
+        for p in sorted(paths, key=str):
+            h.update(f"{p}\0{self.fingerprint(p)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def cached_result(self, name, key, outputs):
+        rec = self.steps.get(name)
+        if not rec or rec["key"] != key:
+            return None
+        # 输出被删除或被修改时也需要重跑
+        for out, fp in rec.get("outputs", {}).items():
+            if self.fingerprint(Path(out)) != fp:
+                return None
+        return rec
+
+    def record(self, name, key, outputs, result):
+        self.steps[name] = {
+            "key": key,
+            "outputs": {str(o): self.fingerprint(o) for o in outputs},
+            "result": result,
+        }
+
+
+def run_step(state, name, inputs, outputs, fn, incremental):
+    """运行一个构建步骤；增量模式下输入与输出均未变化时直接复用上次结果。"""
+    key = state.inputs_key(inputs)
+    if incremental:
+        rec = state.cached_result(name, key, outputs)
+        if rec is not None:
+            return rec["result"], True
+    result = fn()
+    state.record(name, key, outputs, result)
+    return result, False
+
+
+def _walk_files(base):
+    if not base.exists():
+        return []
+    return sorted(p for p in base.rglob("*") if p.is_file())
 
 
 def ensure_dirs():
@@ -47,23 +162,26 @@ def parse_project_doc():
     return {"exists": True, "section_count": len(sections)}
 
 
+TEAM_SECTION = ".bmad-core/agent-teams/team-fullstack.yaml"
+
+
 def extract_team_config():
     if not TEAM_TXT_PATH.exists():
         return {"exists": False}
-    txt = TEAM_TXT_PATH.read_text(encoding="utf-8")
-    # 提取 .bmad-core/agent-teams/team-fullstack.yaml 区块
-    start_tag = "==================== START: .bmad-core/agent-teams/team-fullstack.yaml ===================="
-    end_tag = "==================== END: .bmad-core/agent-teams/team-fullstack.yaml ===================="
-    start_idx = txt.find(start_tag)
-    end_idx = txt.find(end_tag)
+    # 单次流式扫描建立分段索引，再通过 mmap 只读取需要的区块
+    index = index_bundle(TEAM_TXT_PATH)
     yaml_block = None
-    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-        yaml_block = txt[start_idx + len(start_tag):end_idx].strip()
-    # 回退策略：查找首个 YAML 样式 bundle 片段
-    if not yaml_block:
-        m = re.search(r"bundle:\n[\s\S]+?agents:[\s\S]+?workflows:[\s\S]+", txt)
-        if m:
-            yaml_block = m.group(0)
+    with BundleReader(TEAM_TXT_PATH, index) as reader:
+        if TEAM_SECTION in reader:
+            yaml_block = reader.read(TEAM_SECTION)
+        # 回退策略：查找首个以 bundle: 开头的 YAML 分段
+        if not yaml_block:
+            for name in index:
+                if name.endswith(".yaml"):
+                    block = reader.read(name)
+                    if block.startswith("bundle:"):
+                        yaml_block = block
+                        break
     if not yaml_block:
         return {"exists": True, "extracted": False}
     (CONFIG_DIR / "team-fullstack.yaml").write_text(yaml_block, encoding="utf-8")
@@ -96,12 +214,12 @@ def extract_team_config():
 def quality_checks():
     issues = []
     # 检查站点基本文件
-    for fname in ["index.html", "discography.html", "events.html", "styles.css", "script.js"]:
+    for fname in SITE_FILES:
         p = SITE_DIR / fname
         if not p.exists():
             issues.append(f"缺少站点文件: {fname}")
     # 检查根数据 JSON
-    for j in ["discography.json", "events.json", "links.json"]:
+    for j in DATA_FILES:
         p = ROOT / j
         if not p.exists():
             issues.append(f"缺少数据文件: {j}")
@@ -111,7 +229,7 @@ def quality_checks():
             except Exception as e:
                 issues.append(f"JSON 解析失败: {j}: {e}")
     # 简单检查封面目录
-    covers_dir = ROOT / "covers"
+    covers_dir = COVERS_DIR
     if not covers_dir.exists():
         issues.append("缺少封面目录: covers/")
     else:
@@ -122,30 +240,201 @@ def quality_checks():
     return issues
 
 
-def copy_to_dist():
-    # 清理并复制站点与资源
-    if DIST_DIR.exists():
+def quality_inputs():
+    paths = [SITE_DIR / f for f in SITE_FILES] + [ROOT / j for j in DATA_FILES]
+    if COVERS_DIR.exists():
+        paths += [p for p in COVERS_DIR.iterdir() if p.is_file()]
+    return paths
+
+
+def cover_dist_excludes():
+    """不发布的封面（相对 covers/）：索引中未被引用的近似重复项。索引不存在时为空。"""
+    try:
+        index = json.loads(COVER_INDEX_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    return set(index.get("dist_exclude", []))
+
+
+def cover_in_dist(rel, excludes):
+    if rel.split("/", 1)[0] in COVER_BACKUP_DIRS or rel in COVER_STATE_FILES:
+        return False
+    return rel not in excludes
+
+
+def is_pipeline_asset(p):
+    return p.parent == SITE_DIR and p.suffix.lower() in ASSET_EXTS
+
+
+def pipeline_sources():
+    return sorted(p for p in SITE_DIR.iterdir() if p.is_file() and is_pipeline_asset(p)) if SITE_DIR.exists() else []
+
+
+def transform_asset(src, mapping):
+    """压缩单个资源；HTML 另外改写指纹引用、../ 根目录引用，并标记 data-root。"""
+    text = src.read_text(encoding="utf-8")
+    ext = src.suffix.lower()
+    if ext in (".html", ".css"):
+        text = assets.rebase_parent_refs(text, SITE_ROOT_NAMES)
+    if ext == ".html":
+        text = assets.rewrite_refs(text, mapping)
+        text = re.sub(r"<html\b(?![^>]*data-root)", '<html data-root=""', text, count=1, flags=re.I)
+    return assets.MINIFIERS[ext](text).encode("utf-8")
+
+
+def build_site_assets(state):
+    """资源管线第一步：压缩并指纹化站点资源。返回 {dist 路径}，只有源文件或依赖变化的资源会重新生成。"""
+    site = DIST_DIR / "site"
+    outputs = set()
+    stats = {"built": 0, "unchanged": 0}
+    mapping = {}
+    # CSS/JS 先处理：HTML 的输出依赖它们的指纹文件名
+    for src in sorted(pipeline_sources(), key=lambda p: p.suffix.lower() == ".html"):
+        rel = src.relative_to(SITE_DIR).as_posix()
+        deps = json.dumps(mapping, sort_keys=True) if src.suffix.lower() == ".html" else ""
+        key = assets.pipeline_key(state.fingerprint(src), deps, SITE_ROOT_NAMES)
+        rec = state.assets.get(rel)
+        if rec and rec["key"] == key and (site / rec["output"]).exists():
+            stats["unchanged"] += 1
+        else:
+            data = transform_asset(src, mapping)
+            name = assets.fingerprint_name(src.name, data) if src.suffix.lower() in FINGERPRINT_EXTS else src.name
+            dest = site / name
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_bytes(data)
+            perf_trace.TRACER.count_bytes(read=src.stat().st_size, written=len(data))
+            rec = state.assets[rel] = {"key": key, "output": name}
+            stats["built"] += 1
+        if src.suffix.lower() in FINGERPRINT_EXTS:
+            mapping[src.name] = rec["output"]
+        outputs.add(site / rec["output"])
+    return outputs, stats
+
+
+def _compress_job(path):
+    return path, assets.compress(path)
+
+
+def precompress_site(state, files):
+    """资源管线第二步：为站点中的文本文件并行写出 .gz/.br；内容未变的文件跳过。"""
+    site = DIST_DIR / "site"
+    outputs = set()
+    todo = []
+    for p in sorted(files):
+        if p.suffix.lower() not in assets.COMPRESS_EXTS or site not in p.parents:
+            continue
+        rel = "precompress:" + p.relative_to(DIST_DIR).as_posix()
+        key = assets.pipeline_key(state.fingerprint(p), assets.HAS_BROTLI)
+        rec = state.assets.get(rel)
+        if rec and rec["key"] == key and all((DIST_DIR / o).exists() for o in rec["outputs"]):
+            outputs.update(DIST_DIR / o for o in rec["outputs"])
+        else:
+            todo.append((rel, key, p))
+    # gzip/brotli 在压缩期间释放 GIL，线程池即可并行
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+        results = dict(pool.map(_compress_job, [p for _, _, p in todo]))
+    for rel, key, p in todo:
+        written = results[p]
+        for out in written:
+            perf_trace.TRACER.count_bytes(written=out.stat().st_size)
+        state.assets[rel] = {"key": key, "outputs": [o.relative_to(DIST_DIR).as_posix() for o in written]}
+        outputs.update(written)
+    return outputs, {"compressed": len(todo)}
+
+
+def dist_plan():
+    """目标文件 -> 源文件；与原 copytree 顺序一致，后写入者覆盖先写入者。"""
+    plan = {}
+    site = DIST_DIR / "site"
+    for p in _walk_files(SITE_DIR):
+        if not is_pipeline_asset(p):
+            plan[site / p.relative_to(SITE_DIR)] = p
+    # 复制封面与数据（跳过备份、工具状态与重复封面）
+    excludes = cover_dist_excludes()
+    for p in _walk_files(COVERS_DIR):
+        rel = p.relative_to(COVERS_DIR).as_posix()
+        if cover_in_dist(rel, excludes):
+            plan[site / "covers" / rel] = p
+    for j in DATA_FILES:
+        p = ROOT / j
+        if p.exists():
+            plan[site / j] = p
+    for p in _walk_files(SITE_DATA_DIR):
+        plan[site / SITE_DATA_DIR.name / p.relative_to(SITE_DATA_DIR)] = p
+    # 复制文档与配置
+    for src_dir in [DOCS_DIR, CONFIG_DIR]:
+        for p in _walk_files(src_dir):
+            plan[DIST_DIR / src_dir.name / p.relative_to(src_dir)] = p
+    return plan
+
+
+def copy_to_dist(state=None, incremental=False):
+    state = state or BuildState()
+    # 非增量模式：清理后全量复制
+    if not incremental and DIST_DIR.exists():
         for item in DIST_DIR.iterdir():
             if item.is_file():
                 item.unlink(missing_ok=True)
             else:
                 shutil.rmtree(item, ignore_errors=True)
+        state.dist = {}
+        state.assets = {}
     DIST_DIR.mkdir(parents=True, exist_ok=True)
-    shutil.copytree(SITE_DIR, DIST_DIR / "site", dirs_exist_ok=True)
-    # 复制封面与数据
-    if (ROOT / "covers").exists():
-        shutil.copytree(ROOT / "covers", DIST_DIR / "site" / "covers", dirs_exist_ok=True)
-    for j in ["discography.json", "events.json", "links.json"]:
-        p = ROOT / j
-        if p.exists():
-            shutil.copy2(p, DIST_DIR / "site" / j)
-    # 复制文档与配置
-    for src_dir in [DOCS_DIR, CONFIG_DIR]:
-        if src_dir.exists():
-            shutil.copytree(src_dir, DIST_DIR / src_dir.name, dirs_exist_ok=True)
 
+    plan = dist_plan()
+    stats = {"copied": 0, "unchanged": 0, "removed": 0}
+    for dest, src in plan.items():
+        rel = dest.relative_to(DIST_DIR).as_posix()
+        fp = state.fingerprint(src)
+        if state.dist.get(rel) == fp and dest.exists() and dest.stat().st_size == src.stat().st_size:
+            stats["unchanged"] += 1
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dest)
+        state.dist[rel] = fp
+        stats["copied"] += 1
+        perf_trace.TRACER.count_bytes(read=dest.stat().st_size, written=dest.stat().st_size)
+
+    # 资源管线：压缩、指纹化，再为全部站点文本文件生成预压缩副本
+    generated, asset_stats = build_site_assets(state)
+    compressed, compress_stats = precompress_site(state, set(plan) | generated)
+    generated |= compressed
+    stats.update({"assets_built": asset_stats["built"], "compressed": compress_stats["compressed"]})
+
+    # 删除 dist 中已不再对应任何源文件的陈旧文件（包括旧指纹的资源与其压缩副本）
+    keep = set(plan) | generated
+    for p in _walk_files(DIST_DIR):
+        if p not in keep:
+            p.unlink(missing_ok=True)
+            stats["removed"] += 1
+    for rel in [r for r in state.dist if (DIST_DIR / r) not in plan]:
+        del state.dist[rel]
+    for rel, rec in list(state.assets.items()):
+        target = rel[len("precompress:"):] if rel.startswith("precompress:") else "site/" + rec["output"]
+        if (DIST_DIR / target) not in keep:
+            del state.assets[rel]
+    for d in sorted((p for p in DIST_DIR.rglob("*") if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+        if not any(d.iterdir()):
+            d.rmdir()
+    return stats
 
-def write_build_report(structure, team_cfg, issues):
+
+def timing_lines(summary):
+    lines = ["## 构建耗时\n"]
+    lines.append("| 阶段 | 墙钟 (ms) | CPU (ms) |")
+    lines.append("| --- | ---: | ---: |")
+    for name, agg in summary["stages"].items():
+        lines.append(f"| {name} | {agg['wall_ms']:.1f} | {agg['cpu_ms']:.1f} |")
+    lines.append("")
+    lines.append(f"- 总耗时：{summary['wall_ms']:.1f} ms（CPU {summary['cpu_ms']:.1f} ms）")
+    if summary["peak_rss_kb"] is not None:
+        lines.append(f"- 进程峰值内存 (RSS，整个构建的累计最大值，含已回收的子进程)：{summary['peak_rss_kb'] / 1024:.1f} MB")
+    lines.append(f"- 读取 / 写入：{summary['bytes']['read']} / {summary['bytes']['written']} 字节")
+    lines.append(f"- 网络请求：{summary['network']['requests']} 次\n")
+    return lines
+
+
+def write_build_report(structure, team_cfg, issues, incremental=None, timing=None):
     report_md = ROOT / "BUILD_REPORT.md"
     lines = []
     lines.append("# 构建报告\n")
@@ -169,33 +458,82 @@ def write_build_report(structure, team_cfg, issues):
     lines.append(f"- 文档打包：{'是' if docs_ok else '否'}")
     cfg_ok = (DIST_DIR / "config" / "team-fullstack.yaml").exists()
     lines.append(f"- 团队配置打包：{'是' if cfg_ok else '否'}\n")
+    if incremental:
+        lines.append("## 增量构建\n")
+        skipped = incremental.get("skipped") or []
+        lines.append(f"- 跳过的步骤（输入未变化）：{'、'.join(skipped) if skipped else '无'}")
+        sync = incremental.get("sync", {})
+        lines.append(f"- dist 同步：复制 {sync.get('copied', 0)}，未变化 {sync.get('unchanged', 0)}，删除 {sync.get('removed', 0)}")
+        lines.append(f"- 资源管线：重新压缩/指纹化 {sync.get('assets_built', 0)}，重新预压缩 {sync.get('compressed', 0)}\n")
+    if timing:
+        lines.extend(timing_lines(timing))
     report_md.write_text("\n".join(lines), encoding="utf-8")
 
 
-def zip_release():
-    # 生成压缩包 release.zip
-    zip_path = ROOT / "release.zip"
-    if zip_path.exists():
-        zip_path.unlink()
-    shutil.make_archive(str(zip_path).replace(".zip", ""), "zip", DIST_DIR)
-    return zip_path
+def write_delta(previous, files):
+    delta = compute_delta(previous, files)
+    RELEASE_DELTA.write_text(json.dumps(delta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return {k: (len(v) if isinstance(v, list) else v) for k, v in delta.items()}
+
 
+def zip_release(delta=False):
+    # 生成可复现的压缩包 release.zip，并记录内容哈希清单
+    previous = load_manifest(RELEASE_MANIFEST)
+    files = write_release(DIST_DIR, RELEASE_ZIP)
+    write_manifest(RELEASE_MANIFEST, files)
+    result = {"zip": str(RELEASE_ZIP), "entries": len(files)}
+    if delta:
+        # 与上一版清单对比，只有新增/变化的文件需要上传
+        result["delta"] = write_delta(previous, files)
+    return result
 
-def main():
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="MoneyPrinter G 项目构建脚本")
     parser.add_argument("--release", action="store_true", help="生成发行版压缩包")
-    args = parser.parse_args()
+    parser.add_argument("--delta", action="store_true", help="与上一版 release.manifest.json 对比，输出 release.delta.json")
+    parser.add_argument("--incremental", action="store_true", help="增量构建：跳过输入未变化的步骤，仅同步变化的文件到 dist/")
+    args = parser.parse_args(argv)
 
+    tracer = perf_trace.start("build")
     ensure_dirs()
-    doc_info = parse_project_doc()
-    team_info = extract_team_config()
-    issues = quality_checks()
-    copy_to_dist()
-    write_build_report(structure={}, team_cfg=team_info, issues=issues)
+    state = BuildState()
+    inc = args.incremental
+    skipped = []
+
+    def step(name, inputs, outputs, fn):
+        with tracer.stage(name) as ev:
+            result, was_skipped = run_step(state, name, inputs, outputs, fn, inc)
+            ev["skipped"] = was_skipped
+        if was_skipped:
+            skipped.append(name)
+        return result
+
+    doc_info = step("parse_project_doc", [DOC_MD_PATH],
+                    [DOCS_DIR / "ProjectDocumentation.md", DOCS_DIR / "ProjectDocumentation.summary.json"],
+                    parse_project_doc)
+    team_info = step("extract_team_config", [TEAM_TXT_PATH],
+                     [CONFIG_DIR / "team-fullstack.yaml", CONFIG_DIR / "team-fullstack.summary.json"],
+                     extract_team_config)
+    issues = step("quality_checks", quality_inputs(), [], quality_checks)
+    with tracer.stage("copy_to_dist"):
+        sync = copy_to_dist(state, incremental=inc)
     if args.release:
-        zip_release()
+        step("zip_release", _walk_files(DIST_DIR), [RELEASE_ZIP, RELEASE_MANIFEST],
+             lambda: zip_release(delta=args.delta))
+        if args.delta and "zip_release" in skipped:
+            # dist 未变化：发行包与上一版相同，差量为空
+            files = load_manifest(RELEASE_MANIFEST) or {}
+            write_delta(files, files)
+    state.save()
+    write_build_report(structure={}, team_cfg=team_info, issues=issues,
+                       incremental={"skipped": skipped, "sync": sync} if inc else None,
+                       timing=tracer.summary())
+    perf_trace.finish()
     print("构建完成。报告已生成：BUILD_REPORT.md")
+    if inc:
+        print(f"增量构建：跳过 {len(skipped)} 个步骤；dist 复制 {sync['copied']}，删除 {sync['removed']}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import mmap
+import re
+from pathlib import Path
+
+# 分隔行必须独占一行，说明文字中反引号内的示例不会被当作分段
+MARKER_RE = re.compile(rb"^==================== (START|END): (.+?) ====================\s*$")
+
+
+def index_bundle(path):
+    """单次逐行扫描 bundle，返回 {段路径: (字节偏移, 字节长度)}，内存占用与文件大小无关。"""
+    index = {}
+    open_path = None
+    open_offset = 0
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"===================="):
+                m = MARKER_RE.match(line)
+                if m:
+                    kind, name = m.group(1), m.group(2).decode("utf-8")
+                    if kind == b"START":
+                        # 未闭合的上一段截止到新的 START 行
+                        if open_path is not None:
+                            index[open_path] = (open_offset, offset - open_offset)
+                        open_path, open_offset = name, offset + len(line)
+                    elif name == open_path:
+                        index[open_path] = (open_offset, offset - open_offset)
+                        open_path = None
+            offset += len(line)
+    if open_path is not None:
+        index[open_path] = (open_offset, offset - open_offset)
+    return index
+
+
+class BundleReader:
+    """基于 mmap 的惰性读取：只在访问某一段时解码该段。"""
+
+    def __init__(self, path, index=None):
+        self.path = Path(path)
+        self.index = index if index is not None else index_bundle(self.path)
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        self._file = open(self.path, "rb")
+        if self.path.stat().st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def __exit__(self, *exc):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def read(self, name):
+        offset, length = self.index[name]
+        return self._map[offset:offset + length].decode("utf-8").strip()
+
+
+def output_path(out_dir, name):
+    # 去掉 .bmad-core/ 前缀，保留其余目录结构
+    rel = name.split("/", 1)[1] if name.startswith(".bmad-core/") else name
+    return Path(out_dir) / rel
+
+
+def extract_all(bundle_path, out_dir):
+    """一次线性扫描建立索引，然后逐段写出；峰值内存不超过最大的一段。"""
+    index = index_bundle(bundle_path)
+    written = []
+    with BundleReader(bundle_path, index) as reader:
+        for name in index:
+            dest = output_path(out_dir, name)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            dest.write_text(reader.read(name), encoding="utf-8")
+            written.append(str(dest))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引或解包 team bundle 文件")
+    parser.add_argument("bundle", help="bundle 文件路径，例如 team-fullstack.txt")
+    parser.add_argument("--out", help="将全部分段解包到该目录")
+    args = parser.parse_args()
+    if args.out:
+        written = extract_all(args.bundle, args.out)
+        print(f"已写出 {len(written)} 个文件到 {args.out}")
+    else:
+        index = index_bundle(args.bundle)
+        print(json.dumps({k: {"offset": o, "length": n} for k, (o, n) in index.items()}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
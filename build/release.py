@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# 已压缩格式直接存储（STORED），再做 deflate 只浪费 CPU
+STORED_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".avif", ".gif", ".gz", ".br", ".zip", ".woff", ".woff2"}
+DEFLATE_LEVEL = 9
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+# 固定时间戳（ZIP 最早可表示的时间），除非设置 SOURCE_DATE_EPOCH
+DEFAULT_EPOCH = (1980, 1, 1, 0, 0, 0)
+MAX_ZIP32 = 0xFFFFFFFF
+
+
+def _dos_datetime():
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch and epoch.isdigit():
+        t = time.gmtime(max(int(epoch), 315532800))  # 不早于 1980-01-01
+        ts = (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+    else:
+        ts = DEFAULT_EPOCH
+    date = ((ts[0] - 1980) << 9) | (ts[1] << 5) | ts[2]
+    dtime = (ts[3] << 11) | (ts[4] << 5) | (ts[5] // 2)
+    return dtime, date
+
+
+def collect_entries(src_dir):
+    """按归档名排序的 (归档名, 文件路径) 列表，保证条目顺序确定。"""
+    src_dir = Path(src_dir)
+    entries = [(p.relative_to(src_dir).as_posix(), p) for p in src_dir.rglob("*") if p.is_file()]
+    return sorted(entries)
+
+
+def _encode(arcname, path):
+    data = path.read_bytes()
+    sha = hashlib.sha256(data).hexdigest()
+    crc = zlib.crc32(data)
+    if path.suffix.lower() in STORED_EXTS:
+        return arcname, ZIP_STORED, crc, len(data), data, sha
+    # 原始 deflate 流（无 zlib 头），zlib 在压缩期间释放 GIL，线程池即可并行
+    co = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15)
+    packed = co.compress(data) + co.flush()
+    if len(packed) >= len(data):
+        return arcname, ZIP_STORED, crc, len(data), data, sha
+    return arcname, ZIP_DEFLATED, crc, len(data), packed, sha
+
+
+def _ordered_map(fn, items, workers):
+    """并行执行但按输入顺序产出结果；同时在途的任务数有上限，内存占用有界。"""
+    window = max(1, workers * 2)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, *item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_release(src_dir, zip_path, workers=None):
+    """写出可复现的 zip：排序条目、固定时间戳与权限、图片不再压缩、文本并行 deflate。
+
+    返回 {归档名: {"sha256", "size"}} 内容清单。
+    """
+    workers = workers or os.cpu_count() or 1
+    dtime, ddate = _dos_datetime()
+    manifest = {}
+    central = []
+    zip_path = Path(zip_path)
+    tmp = zip_path.with_suffix(".zip.tmp")
+    with open(tmp, "wb") as out:
+        for arcname, method, crc, usize, data, sha in _ordered_map(_encode, collect_entries(src_dir), workers):
+            if out.tell() > MAX_ZIP32 or usize > MAX_ZIP32:
+                raise ValueError("release archive exceeds ZIP32 limits")
+            name = arcname.encode("utf-8")
+            offset = out.tell()
+            # 本地文件头；标志位 0x0800 表示文件名为 UTF-8
+            out.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, 0x0800, method, dtime, ddate,
+                                  crc, len(data), usize, len(name), 0))
+            out.write(name)
+            out.write(data)
+            central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 20, 20, 0x0800, method,
+                                       dtime, ddate, crc, len(data), usize, len(name), 0, 0, 0, 0,
+                                       0o100644 << 16, offset) + name)
+            manifest[arcname] = {"sha256": sha, "size": usize}
+        cd_offset = out.tell()
+        for rec in central:
+            out.write(rec)
+        cd_size = out.tell() - cd_offset
+        out.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), cd_size, cd_offset, 0))
+    os.replace(tmp, zip_path)
+    return manifest
+
+
+def load_manifest(path):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError):
+        return None
+
+
+def compute_delta(previous, current):
+    """与上一版清单比较，只有 added/changed 中的文件需要重新上传。"""
+    previous = previous or {}
+    added = sorted(k for k in current if k not in previous)
+    changed = sorted(k for k in current if k in previous and previous[k]["sha256"] != current[k]["sha256"])
+    removed = sorted(k for k in previous if k not in current)
+    return {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": len(current) - len(added) - len(changed),
+        "upload_bytes": sum(current[k]["size"] for k in added + changed),
+    }
+
+
+def write_manifest(path, files):
+    Path(path).write_text(json.dumps({"files": files}, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
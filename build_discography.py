@@ -1,17 +1,50 @@
 import re
 import json
+import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
 import requests
+from requests.adapters import HTTPAdapter
+from http_cache import HttpCache, FOREVER
+from project_config import CONFIG
+import perf_trace
 
-ROOT = Path(r"c:\Users\Stack\Documents\trae_projects\moneyprinterg")
-LINKS_JSON = ROOT / "links.json"
-COVERS_DIR = ROOT / "covers"
-OUTPUT = ROOT / "discography.json"
+ROOT = CONFIG.root
+LINKS_JSON = CONFIG.path_for("links_json")
+COVERS_DIR = CONFIG.path_for("covers")
+OUTPUT = CONFIG.path_for("discography")
+VARIANTS_MANIFEST = COVERS_DIR / "_variants" / "manifest.json"
+EVENTS_JSON = CONFIG.path_for("events")
+# Precomputed site data: small index for the grids, per-track detail shards and
+# one minified bundle; shard and bundle names carry a content hash for long-lived caching
+SITE_DATA_DIR = CONFIG.path_for("site_data")
+SITE_DATA_INDEX = SITE_DATA_DIR / "index.json"
+HASH_LEN = 10
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
+FETCH_WORKERS = 8  # concurrent publish-date lookups
+
 session = requests.Session()
 session.headers.update({"User-Agent": USER_AGENT})
+# One keep-alive slot per fetch worker so concurrent lookups reuse connections
+session.mount("https://", HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS))
+perf_trace.TRACER.instrument_session(session)
+
+CACHE_KIND = "youtube_publish_date"
+DATE_MISS_TTL = 24 * 3600  # retry pages without a date daily; found dates never change
+cache = HttpCache()
+
+# Streaming publish-date scan: stop at the first match, never read past MAX_SCAN_BYTES
+SCAN_CHUNK = 16 * 1024
+MAX_SCAN_BYTES = 2 * 1024 * 1024
+DATE_PATTERNS = (
+    re.compile(rb'<meta itemprop="datePublished" content="([^"]{1,64})"'),
+    re.compile(rb'"publishDate":"(\d{4}-\d{2}-\d{2})"'),
+)
+# Longest possible match; this much of each chunk is carried into the next scan
+SCAN_OVERLAP = 128
 
 
 def norm(s: str) -> str:
@@ -25,26 +58,79 @@ def title_from_filename(name: str) -> str:
     return re.sub(r"\b(\w)", lambda m: m.group(1).upper(), base)
 
 
-def get_youtube_publish_date(url: str):
+def get_youtube_publish_date(url: str, sess=None, cache=cache):
+    sess = sess or session
+    entry = cache.get(CACHE_KIND, url)
+    if HttpCache.is_fresh(entry):
+        return entry["values"].get("date")
     try:
-        r = session.get(url, timeout=20)
-        if r.status_code >= 400:
-            return None
-        html = r.text
-        # Try itemprop meta tag
-        m = re.search(r'<meta itemprop="datePublished" content="(.*?)"', html)
-        if m:
-            return m.group(1)
-        # Try JSON field publishDate
-        m2 = re.search(r'"publishDate":"(\d{4}-\d{2}-\d{2})"', html)
-        if m2:
-            return m2.group(1)
-        return None
+        with sess.get(url, timeout=20, headers=HttpCache.validators(entry), stream=True) as r:
+            if r.status_code == 304 and entry:
+                cache.touch(CACHE_KIND, url, resp=r)
+                return entry["values"].get("date")
+            if r.status_code >= 400:
+                return None
+            # Leaving the with-block closes the connection, dropping the unread rest of the page
+            date = extract_publish_date(r.iter_content(chunk_size=SCAN_CHUNK))
+        cache.store(CACHE_KIND, url, r, ttl=FOREVER if date else DATE_MISS_TTL, values={"date": date})
+        return date
     except Exception:
         return None
 
 
-def build():
+def extract_publish_date(chunks, max_bytes=MAX_SCAN_BYTES):
+    """Scan an iterable of byte chunks for the publish date, stopping at the first match.
+
+    The tail of each chunk is kept so matches that straddle a chunk boundary
+    are still found; at most `max_bytes` are consumed.
+    """
+    tail = b""
+    read = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        chunk = chunk[:max_bytes - read]
+        read += len(chunk)
+        buf = tail + chunk
+        for pat in DATE_PATTERNS:
+            m = pat.search(buf)
+            if m:
+                return m.group(1).decode("utf-8", "replace")
+        tail = buf[-SCAN_OVERLAP:]
+        if read >= max_bytes:
+            break
+    return None
+
+
+def load_cover_variants():
+    if not VARIANTS_MANIFEST.exists():
+        return {}
+    manifest = json.loads(VARIANTS_MANIFEST.read_text(encoding="utf-8"))
+    sizes = manifest.get("sizes")
+    modern = ["image/" + f for f in manifest.get("formats", [])]
+    out = {}
+    for rel, entry in manifest.get("covers", {}).items():
+        srcset = entry.get("srcset", {})
+        fallback = [t for t in srcset if t not in modern]
+        out[rel] = {
+            "sizes": sizes,
+            # <source> elements in preference order, then the <img> fallback
+            "sources": [{"type": t, "srcset": srcset[t]} for t in modern if t in srcset],
+            "srcset": srcset[fallback[0]] if fallback else None,
+        }
+    return out
+
+
+def video_id(url: str) -> str:
+    # Same video under different playlist/query params should be fetched once
+    parts = urlsplit(url)
+    if parts.netloc.endswith("youtu.be"):
+        return parts.path.strip("/") or url
+    v = parse_qs(parts.query).get("v")
+    return v[0] if v else url
+
+
+def load_link_map():
     links = json.loads(LINKS_JSON.read_text(encoding="utf-8"))
     link_map = {}
     for entry in links.get("links", []):
@@ -52,39 +138,197 @@ def build():
         u = entry.get("final_url", entry.get("url"))
         if t and u:
             link_map[norm(t)] = u
+    return link_map
 
-    tracks = []
+
+def collect_tracks(link_map):
+    """Stage 1: local-only pass resolving titles, keys and YouTube links."""
+    local = []
     for p in sorted(COVERS_DIR.iterdir()):
         if p.is_file() and p.suffix.lower() in (".png", ".jpg", ".jpeg") and not p.name.startswith("_"):
-            title = title_from_filename(p.name)
-            key = norm(p.name)
-            yt = link_map.get(key)
-            date = get_youtube_publish_date(yt) if yt else None
-            track = {
-                "title": title,
-                "cover": f"covers/{p.name}",
-                "releaseDate": date,  # ISO YYYY-MM-DD or None
-                "platforms": {
-                    "youtube": yt,
-                    "spotify": f"https://open.spotify.com/search/{requests.utils.quote('MoneyPrinter G ' + title)}",
-                    "apple": f"https://music.apple.com/us/search?term={requests.utils.quote('MoneyPrinter G ' + title)}",
-                    "hyperfollow": "https://hyperfollow.com/moneyprinterg"
-                },
-                "credits": {
-                    "artist": "MoneyPrinter G",
-                    "producer": "Unknown",
-                    "writers": ["MoneyPrinter G"],
-                    "label": "Independent"
-                }
-            }
-            tracks.append(track)
-
-    # Sort chronologically; None dates last
-    tracks.sort(key=lambda t: (t["releaseDate"] is None, t["releaseDate"] or "9999-12-31"))
-
-    OUTPUT.write_text(json.dumps({"updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "tracks": tracks}, indent=2), encoding="utf-8")
-    print("Wrote", len(tracks), "tracks to", OUTPUT)
+            local.append({
+                "name": p.name,
+                "title": title_from_filename(p.name),
+                "youtube": link_map.get(norm(p.name)),
+            })
+    return local
+
+
+def fetch_publish_dates(urls, workers=FETCH_WORKERS, sess=None, cache=cache):
+    """Stage 2: one lookup per distinct video, run concurrently; returns {url: date}."""
+    by_video = {}
+    for u in urls:
+        by_video.setdefault(video_id(u), u)
+    if not by_video:
+        return {}
+    def timed_lookup(vid):
+        with perf_trace.TRACER.item(vid):
+            return get_youtube_publish_date(by_video[vid], sess, cache)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(by_video)))) as pool:
+        dates = dict(zip(by_video, pool.map(timed_lookup, by_video)))
+    return {u: dates[video_id(u)] for u in urls}
+
+
+def make_track(item, date, variants):
+    title = item["title"]
+    return {
+        "title": title,
+        "cover": f"covers/{item['name']}",
+        "coverVariants": variants.get(item["name"]),
+        "releaseDate": date,  # ISO YYYY-MM-DD or None
+        "platforms": {
+            "youtube": item["youtube"],
+            "spotify": f"https://open.spotify.com/search/{requests.utils.quote('MoneyPrinter G ' + title)}",
+            "apple": f"https://music.apple.com/us/search?term={requests.utils.quote('MoneyPrinter G ' + title)}",
+            "hyperfollow": "https://hyperfollow.com/moneyprinterg"
+        },
+        "credits": {
+            "artist": "MoneyPrinter G",
+            "producer": "Unknown",
+            "writers": ["MoneyPrinter G"],
+            "label": "Independent"
+        }
+    }
+
+
+def compact(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=True)
+
+
+def hashed_name(stem: str, payload: str) -> str:
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:HASH_LEN]
+    return f"{stem}.{digest}.json"
+
+
+def track_id(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+
+def track_ids(tracks):
+    """Title slugs, unique per track: a slug already taken (or empty) gets a short
+    hash of the track's cover file, which is what identifies a track here."""
+    ids, seen = [], set()
+    for t in tracks:
+        tid = track_id(t["title"])
+        if not tid or tid in seen:
+            digest = hashlib.sha256(t["cover"].encode("utf-8")).hexdigest()[:6]
+            tid = f"{tid}-{digest}" if tid else digest
+        seen.add(tid)
+        ids.append(tid)
+    return ids
+
+
+def load_json(path: Path, default):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+def site_data(tracks, updated_at):
+    """Split tracks into the summary index and per-track detail records.
+
+    Fields identical on every track (credits, hyperfollow) are stored once
+    under "shared"; a detail record only carries values that differ from it,
+    and tracks without any get none. Spotify/Apple links are title searches
+    that script.js builds itself. Tracks stay in release-date order and carry
+    their YouTube link pre-joined.
+    """
+    shared = {
+        "credits": tracks[0]["credits"] if tracks else {},
+        "hyperfollow": tracks[0]["platforms"]["hyperfollow"] if tracks else None,
+    }
+    summary, details = [], {}
+    for t, tid in zip(tracks, track_ids(tracks)):
+        summary.append({
+            "id": tid,
+            "title": t["title"],
+            "cover": t["cover"],
+            "coverVariants": t.get("coverVariants"),  # absent from discography.json files older than the variants
+            "releaseDate": t["releaseDate"],
+            "youtube": t["platforms"]["youtube"],
+        })
+        detail = {}
+        if t["platforms"]["hyperfollow"] != shared["hyperfollow"]:
+            detail["hyperfollow"] = t["platforms"]["hyperfollow"]
+        if t["credits"] != shared["credits"]:
+            detail["credits"] = t["credits"]
+        if detail:
+            details[tid] = detail
+
+    # Search suggestions: track titles first, then every checked link
+    search, seen = [], set()
+    links = load_json(LINKS_JSON, {}).get("links", [])
+    candidates = [(t["title"], t["youtube"] or "#") for t in summary]
+    candidates += [(l.get("title"), l.get("final_url") or l.get("url") or "#") for l in links]
+    for label, url in candidates:
+        if label and (label, url) not in seen:
+            seen.add((label, url))
+            search.append({"label": label, "url": url})
+
+    index = {"updatedAt": updated_at, "shared": shared, "tracks": summary, "search": search}
+    return index, details
+
+
+def write_site_data(tracks, updated_at):
+    """Write site-data/: index.json, tracks/<id>.<hash>.json and site-data.<hash>.json."""
+    index, details = site_data(tracks, updated_at)
+    shard_dir = SITE_DATA_DIR / "tracks"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    written = set()
+    for entry in index["tracks"]:
+        if entry["id"] not in details:
+            continue
+        payload = compact(details[entry["id"]])
+        name = hashed_name(entry["id"], payload)
+        (shard_dir / name).write_text(payload, encoding="utf-8")
+        entry["detail"] = f"tracks/{name}"
+        written.add(shard_dir / name)
+
+    # updatedAt stays out of hashed files so an unchanged catalog keeps its names
+    events = load_json(EVENTS_JSON, {"events": []})
+    body = {k: v for k, v in index.items() if k != "updatedAt"}
+    bundle = compact({**body, "details": details, "events": events.get("events", [])})
+    bundle_name = hashed_name("site-data", bundle)
+    (SITE_DATA_DIR / bundle_name).write_text(bundle, encoding="utf-8")
+    written.add(SITE_DATA_DIR / bundle_name)
+    # The index is the entry point: fixed name, short cache lifetime, points at the hashed files
+    index["bundle"] = bundle_name
+    SITE_DATA_INDEX.write_text(compact(index), encoding="utf-8")
+    written.add(SITE_DATA_INDEX)
+
+    # Drop shards and bundles from earlier builds
+    for p in SITE_DATA_DIR.rglob("*.json"):
+        if p not in written:
+            p.unlink()
+    return sum(p.stat().st_size for p in written)
+
+
+def build(workers=FETCH_WORKERS, sess=None, cache=cache):
+    """Write discography.json and site-data/; `mpg.py` passes its shared session and HTTP cache."""
+    tracer = perf_trace.start("build_discography")
+    with tracer.stage("collect"):
+        local = collect_tracks(load_link_map())
+        variants = load_cover_variants()
+    with tracer.stage("fetch", workers=workers):
+        dates = fetch_publish_dates([i["youtube"] for i in local if i["youtube"]], workers, sess, cache)
+
+    # Stage 3: merge, then sort chronologically; None dates last
+    with tracer.stage("merge"):
+        tracks = [make_track(i, dates.get(i["youtube"]), variants) for i in local]
+        tracks.sort(key=lambda t: (t["releaseDate"] is None, t["releaseDate"] or "9999-12-31"))
+
+        cache.save()
+        updated_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        payload = json.dumps({"updatedAt": updated_at, "tracks": tracks}, indent=2)
+        OUTPUT.write_text(payload, encoding="utf-8")
+        tracer.count_bytes(written=len(payload.encode("utf-8")))
+    with tracer.stage("site_data"):
+        tracer.count_bytes(written=write_site_data(tracks, updated_at))
+    print("Wrote", len(tracks), "tracks to", OUTPUT, "and", SITE_DATA_DIR)
+    perf_trace.finish()
 
 
 if __name__ == "__main__":
-    build()
\ No newline at end of file
+    build()
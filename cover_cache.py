@@ -0,0 +1,164 @@
+"""Content-hash manifest shared by the in-place cover scripts.
+
+Both `process_covers.py` (stage "upscale") and `resize_covers.py` (stage
+"resize") rewrite files in `covers/` in place. The manifest remembers, per
+file and per stage, which source content + settings produced which output, so
+a rerun can skip files whose output is already current and can tell apart
+"upstream stage changed this file" from "someone edited or deleted it".
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = 'cover_manifest.json'
+MANIFEST_VERSION = 1
+
+# In-place stages in pipeline order. An upstream stage's output may legitimately
+# be overwritten by a downstream stage, so an upstream stage is still current
+# when the file holds the output of any later stage fed from its own output.
+STAGE_ORDER = ('upscale', 'resize')
+
+HASH_CHUNK = 1 << 20
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def settings_key(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class CoverManifest:
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.files = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.files = data.get('files', {})
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.files}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def digest(self, rel, path):
+        """Return the sha256 of `path`, reusing the stored hash when size and mtime match."""
+        st = os.stat(path)
+        ent = self.files.setdefault(rel, {})
+        memo = ent.get('stat')
+        if memo and memo['size'] == st.st_size and memo['mtime_ns'] == st.st_mtime_ns:
+            return memo['sha256']
+        digest = sha256_file(path)
+        self._remember_stat(ent, st, digest)
+        return digest
+
+    def _remember_stat(self, ent, st, digest):
+        ent['stat'] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        self.dirty = True
+
+    def _expected_outputs(self, rel, stage):
+        ent = self.files.get(rel) or {}
+        stages = ent.get('stages', {})
+        rec = stages.get(stage)
+        if not rec:
+            return set()
+        out = rec['output_sha256']
+        expected = {out}
+        for later in STAGE_ORDER[STAGE_ORDER.index(stage) + 1:] if stage in STAGE_ORDER else ():
+            nxt = stages.get(later)
+            if nxt and nxt['source_sha256'] == out:
+                out = nxt['output_sha256']
+                expected.add(out)
+        return expected
+
+    def status(self, rel, path, stage, settings):
+        """Classify `path` for `stage`.
+
+        Returns one of 'current', 'new' (never processed or settings changed),
+        'upstream' (an earlier stage rewrote it), 'edited' or 'missing'.
+        """
+        ent = self.files.get(rel) or {}
+        rec = ent.get('stages', {}).get(stage)
+        if not os.path.exists(path):
+            return 'missing' if rec else 'new'
+        if not rec or rec.get('settings') != settings_key(settings):
+            return 'new'
+        current = self.digest(rel, path)
+        if current in self._expected_outputs(rel, stage):
+            return 'current'
+        stages = ent.get('stages', {})
+        if stage in STAGE_ORDER:
+            for earlier in STAGE_ORDER[:STAGE_ORDER.index(stage)]:
+                up = stages.get(earlier)
+                if up and up['output_sha256'] == current:
+                    return 'upstream'
+        return 'edited'
+
+    def record(self, rel, path, stage, settings, source_sha256, output_sha256=None, result=None):
+        ent = self.files.setdefault(rel, {})
+        if output_sha256 is None:
+            output_sha256 = sha256_file(path)
+        ent.setdefault('stages', {})[stage] = {
+            'settings': settings_key(settings),
+            'source_sha256': source_sha256,
+            'output_sha256': output_sha256,
+            'result': result,
+        }
+        self._remember_stat(ent, os.stat(path), output_sha256)
+
+    def holds_output(self, rel, path, stage):
+        """Whether `path` still holds what `stage` (or a later stage fed from it) wrote."""
+        return os.path.exists(path) and self.digest(rel, path) in self._expected_outputs(rel, stage)
+
+    def source_for_repair(self, rel, stage, backup_path):
+        """Return `backup_path` if it still holds the recorded source for `stage`."""
+        return self.repair_source(rel, stage, backup_path)[0]
+
+    def repair_source(self, rel, stage, backup_path):
+        """(backup_path, None) if it still holds the recorded source, else (None, reason)."""
+        rec = (self.files.get(rel) or {}).get('stages', {}).get(stage)
+        if not rec:
+            return None, 'nothing recorded'
+        if not os.path.exists(backup_path):
+            return None, 'no backup'
+        if sha256_file(backup_path) != rec['source_sha256']:
+            return None, 'backup does not match the recorded source'
+        return backup_path, None
+
+    def last_result(self, rel, stage):
+        rec = (self.files.get(rel) or {}).get('stages', {}).get(stage)
+        return dict(rec['result']) if rec and rec.get('result') else None
+
+    def forget(self, rel):
+        """Drop every stage record of `rel`, e.g. after the cover was deleted on purpose."""
+        if self.files.pop(rel, None) is not None:
+            self.dirty = True
+
+    def prune(self, stage, live_rels):
+        """Forget `stage` records for files that no longer exist and cannot be repaired."""
+        for rel in list(self.files):
+            if rel in live_rels:
+                continue
+            stages = self.files[rel].get('stages', {})
+            if stages.pop(stage, None) is not None:
+                self.dirty = True
+            if not stages:
+                del self.files[rel]
+                self.dirty = True
@@ -0,0 +1,218 @@
+"""Perceptual-hash index over covers/ for duplicate and backup detection.
+
+Every image under covers/ (live covers and the _backup_* folders) gets a 64-bit
+dHash and pHash, computed for the whole catalog at once with NumPy and stored
+in covers/phash_index.json (entries are reused while size and mtime match).
+Hamming distances against the full index are one vectorized XOR + popcount.
+
+The index also lists, under "dist_exclude", near-duplicate covers the site
+doesn't reference; `build/build.py` leaves those out of dist/ along with the
+backup folders and tool state files.
+"""
+import argparse
+import json
+from pathlib import Path
+from PIL import Image
+from project_config import CONFIG
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+COVERS_DIR = CONFIG.path_for("covers")
+SITE_DIR = CONFIG.path_for("site")
+INDEX_PATH = COVERS_DIR / "phash_index.json"
+INDEX_VERSION = 1
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
+BACKUP_DIRS = ("_backup_originals", "_backup_resized_originals")
+DUPLICATE_DISTANCE = 6  # pHash bits; re-exports of the same art land well below this
+BACKUP_DISTANCE = 12  # backups may be a different crop/size of the live cover
+HASH_SIDE = 32  # pHash input size; the low 8x8 DCT frequencies become the hash
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+def _pack(bits):
+    """(N, 64) bool -> list of 16-char hex strings."""
+    packed = np.packbits(bits.astype(np.uint8), axis=1)
+    return [row.tobytes().hex() for row in packed]
+
+
+def _load_gray(path, side):
+    with Image.open(path) as im:
+        if im.format == "JPEG":
+            im.draft("L", (side * 4, side * 4))
+        im = im.convert("L")
+        return np.asarray(im.resize((side, side), Image.Resampling.LANCZOS), dtype=np.float32)
+
+
+def compute_hashes(paths):
+    """Return [(dhash_hex, phash_hex)] for `paths`, batching the math over all images."""
+    if not paths:
+        return []
+    grays = np.stack([_load_gray(p, HASH_SIDE) for p in paths])  # (N, 32, 32)
+
+    # dHash: 9x8 thumbnail (rows averaged over 4-pixel bands, 9 columns point-sampled
+    # from the 32x32 LANCZOS image), bit = left pixel brighter than right
+    n = grays.shape[0]
+    rows = grays.reshape(n, 8, HASH_SIDE // 8, HASH_SIDE).mean(axis=2)  # (N, 8, 32)
+    cols = np.linspace(0, HASH_SIDE - 1, 9).round().astype(int)
+    d = rows[:, :, cols]
+    dbits = (d[:, :, :-1] > d[:, :, 1:]).reshape(n, 64)
+
+    # pHash: 2-D DCT of every image in one einsum, low 8x8 block vs its median (DC excluded)
+    c = _dct_matrix(HASH_SIDE)
+    dct = np.einsum("ij,njk,lk->nil", c, grays, c)[:, :8, :8].reshape(n, 64)
+    med = np.median(dct[:, 1:], axis=1, keepdims=True)
+    pbits = dct > med
+
+    return list(zip(_pack(dbits), _pack(pbits)))
+
+
+def hamming(query_hex, hex_list):
+    """Vectorized Hamming distances from one hash to many."""
+    if not hex_list:
+        return np.zeros(0, dtype=np.int64)
+    table = np.frombuffer(bytes.fromhex("".join(hex_list)), dtype=np.uint8).reshape(len(hex_list), 8)
+    q = np.frombuffer(bytes.fromhex(query_hex), dtype=np.uint8)
+    return np.unpackbits(table ^ q, axis=1).sum(axis=1)
+
+
+def iter_images():
+    for p in sorted(COVERS_DIR.rglob("*")):
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTS:
+            rel = p.relative_to(COVERS_DIR).as_posix()
+            if rel.startswith("_variants/"):
+                continue
+            yield rel, p
+
+
+def kind_of(rel):
+    top = rel.split("/", 1)[0]
+    return "backup" if top in BACKUP_DIRS else "live"
+
+
+def referenced_covers():
+    """Cover filenames the site actually uses (discography.json and the site sources)."""
+    refs = set()
+    disc = CONFIG.path_for("discography")
+    if disc.exists():
+        for t in json.loads(disc.read_text(encoding="utf-8")).get("tracks", []):
+            if t.get("cover", "").startswith("covers/"):
+                refs.add(t["cover"][len("covers/"):])
+    if SITE_DIR.exists():
+        live = [rel for rel, _ in iter_images() if kind_of(rel) == "live"]  # walk covers/ once, not per file
+        for p in SITE_DIR.iterdir():
+            if p.suffix.lower() in (".html", ".css", ".js"):
+                text = p.read_text(encoding="utf-8", errors="replace")
+                refs.update(rel for rel in live if rel in text)
+    return refs
+
+
+def load_index(path=INDEX_PATH):
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == INDEX_VERSION else {}
+
+
+def build_index(force=False):
+    if not HAS_NUMPY:
+        raise RuntimeError("the perceptual-hash index needs numpy (pip install numpy)")
+    previous = {} if force else load_index().get("images", {})
+    images = {}
+    todo = []
+    for rel, p in iter_images():
+        st = p.stat()
+        old = previous.get(rel)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            images[rel] = old
+            continue
+        images[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "kind": kind_of(rel)}
+        todo.append((rel, p))
+    for (rel, _), (dh, ph) in zip(todo, compute_hashes([p for _, p in todo])):
+        images[rel].update({"dhash": dh, "phash": ph})
+
+    live = sorted(r for r, e in images.items() if e["kind"] == "live")
+    backups = sorted(r for r, e in images.items() if e["kind"] == "backup")
+    live_hashes = [images[r]["phash"] for r in live]
+    backup_hashes = [images[r]["phash"] for r in backups]
+
+    # Near-duplicate groups among live covers (union-find over pairs within distance)
+    parent = {r: r for r in live}
+
+    def find(r):
+        while parent[r] != r:
+            parent[r] = parent[parent[r]]
+            r = parent[r]
+        return r
+
+    for i, r in enumerate(live):
+        dist = hamming(images[r]["phash"], live_hashes[i + 1:])
+        for j in np.nonzero(dist <= DUPLICATE_DISTANCE)[0]:
+            parent[find(live[i + 1 + j])] = find(r)
+    groups = {}
+    for r in live:
+        groups.setdefault(find(r), []).append(r)
+    duplicates = [sorted(g) for g in groups.values() if len(g) > 1]
+
+    # Backups of each live cover: same file name, or the closest hash within BACKUP_DISTANCE
+    backup_map = {}
+    for r in live:
+        dist = hamming(images[r]["phash"], backup_hashes)
+        name = r.rsplit("/", 1)[-1]
+        matches = [{"path": b, "distance": int(d)} for b, d in zip(backups, dist)
+                   if b.rsplit("/", 1)[-1] == name or d <= BACKUP_DISTANCE]
+        backup_map[r] = sorted(matches, key=lambda m: (m["distance"], m["path"]))
+
+    refs = referenced_covers()
+    excluded = []
+    for group in duplicates:
+        # Keep a referenced copy (or the first by name); drop unreferenced re-exports
+        keep = next((r for r in group if r in refs), group[0])
+        excluded += [r for r in group if r != keep and r not in refs]
+
+    index = {
+        "version": INDEX_VERSION,
+        "thresholds": {"duplicate": DUPLICATE_DISTANCE, "backup": BACKUP_DISTANCE},
+        "images": images,
+        "duplicates": duplicates,
+        "backups": backup_map,
+        "dist_exclude": sorted(excluded),
+    }
+    INDEX_PATH.write_text(json.dumps(index, indent=2, sort_keys=True), encoding="utf-8")
+    return index, len(todo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the perceptual-hash index for covers/")
+    parser.add_argument("--force", action="store_true", help="rehash every image")
+    parser.add_argument("--query", help="list indexed images within --distance of this image")
+    parser.add_argument("--distance", type=int, default=DUPLICATE_DISTANCE)
+    args = parser.parse_args(argv)
+
+    index, hashed = build_index(force=args.force)
+    print(f"Indexed {len(index['images'])} images ({hashed} hashed) -> {INDEX_PATH}")
+    print(f"Near-duplicate groups: {len(index['duplicates'])}; excluded from dist: {len(index['dist_exclude'])}")
+    for group in index["duplicates"]:
+        print("  -", ", ".join(group))
+    if args.query:
+        (dh, ph), = compute_hashes([Path(args.query)])
+        names = sorted(index["images"])
+        dist = hamming(ph, [index["images"][n]["phash"] for n in names])
+        for n, d in sorted(zip(names, dist), key=lambda x: x[1]):
+            if d <= args.distance:
+                print(f"  {d:2d}  {n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Encoder auto-tuning: smallest encoding of a cover within a perceptual-error budget.
+
+Candidates (JPEG quality/subsampling, PNG palette quantization, WebP quality)
+are encoded in parallel and each one is compared with the source pixels using
+a block SSIM and PSNR computed with NumPy. The in-place cover keeps its own
+format family so filenames stay valid; the best WebP candidate is measured
+too and reported, since the responsive variants ship WebP.
+"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+MIN_SSIM = 0.985  # error budget: mean 8x8-block SSIM on luma
+MIN_PSNR = 38.0  # dB, guards against SSIM missing flat-area banding
+SSIM_BLOCK = 8
+TUNE_WORKERS = 4
+
+JPEG_QUALITIES = (92, 88, 84, 80, 76, 72)
+JPEG_SUBSAMPLINGS = (0, 2)  # 4:4:4, 4:2:0
+PNG_PALETTE_COLORS = (256, 128, 64)
+WEBP_QUALITIES = (90, 85, 80, 75, 70)
+
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _luma(img):
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    a = np.asarray(img, dtype=np.float32)
+    y = a[..., 0] * 0.299 + a[..., 1] * 0.587 + a[..., 2] * 0.114
+    if a.shape[-1] == 4:
+        # Compare what a browser shows over a dark page, so hidden pixels don't count
+        y = y * (a[..., 3] / 255.0)
+    return y
+
+
+def _blocks(y):
+    h = y.shape[0] - y.shape[0] % SSIM_BLOCK
+    w = y.shape[1] - y.shape[1] % SSIM_BLOCK
+    return y[:h, :w].reshape(h // SSIM_BLOCK, SSIM_BLOCK, w // SSIM_BLOCK, SSIM_BLOCK).swapaxes(1, 2)
+
+
+def metrics(ref, test):
+    """Return (ssim, psnr) of `test` against `ref`, both PIL images of equal size."""
+    x, y = _luma(ref), _luma(test)
+    mse = float(np.mean((x - y) ** 2))
+    psnr = float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+    bx, by = _blocks(x), _blocks(y)
+    mx, my = bx.mean(axis=(2, 3)), by.mean(axis=(2, 3))
+    vx, vy = bx.var(axis=(2, 3)), by.var(axis=(2, 3))
+    cov = ((bx - mx[..., None, None]) * (by - my[..., None, None])).mean(axis=(2, 3))
+    ssim = ((2 * mx * my + _C1) * (2 * cov + _C2)) / ((mx ** 2 + my ** 2 + _C1) * (vx + vy + _C2))
+    return float(ssim.mean()), psnr
+
+
+def candidates(family):
+    """(label, format, save params, palette colors) tuples for a format family."""
+    if family == 'JPEG':
+        return [(f'jpeg-q{q}-ss{ss}', 'JPEG', {'quality': q, 'subsampling': ss, 'optimize': True,
+                                               'progressive': True}, None)
+                for q in JPEG_QUALITIES for ss in JPEG_SUBSAMPLINGS]
+    if family == 'PNG':
+        return [(f'png-palette{n}', 'PNG', {'optimize': True}, n) for n in PNG_PALETTE_COLORS]
+    if family == 'WEBP':
+        return [(f'webp-q{q}', 'WEBP', {'quality': q, 'method': 6}, None) for q in WEBP_QUALITIES]
+    return []
+
+
+def _encode(img, fmt, params, colors, icc):
+    if colors:
+        method = Image.Quantize.FASTOCTREE if img.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+        img = img.quantize(colors=colors, method=method, dither=Image.Dither.FLOYDSTEINBERG)
+    elif fmt == 'JPEG' and img.mode == 'RGBA':
+        img = img.convert('RGB')
+    params = dict(params)
+    if icc:
+        params['icc_profile'] = icc
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **params)
+    return buf.getvalue()
+
+
+def _evaluate(ref, cand, icc):
+    label, fmt, params, colors = cand
+    data = _encode(ref, fmt, params, colors, icc)
+    with Image.open(io.BytesIO(data)) as decoded:
+        decoded.load()
+        ssim, psnr = metrics(ref, decoded.convert(ref.mode))
+    return {'label': label, 'format': fmt, 'params': {**params, **({'colors': colors} if colors else {})},
+            'bytes': len(data), 'ssim': round(ssim, 5), 'psnr': round(psnr, 2), 'data': data}
+
+
+def within_budget(res, min_ssim=MIN_SSIM, min_psnr=MIN_PSNR):
+    return res['ssim'] >= min_ssim and res['psnr'] >= min_psnr
+
+
+def tune(img, family, baseline, icc=None, min_ssim=MIN_SSIM, min_psnr=MIN_PSNR, workers=TUNE_WORKERS):
+    """Pick the smallest encoding of `img` within budget.
+
+    `baseline` is the (bytes, format) the regular encoder produced; it is kept
+    whenever no candidate is both smaller and within budget. Returns
+    (bytes, format, report) where report has no raw data.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError('encoder tuning needs numpy (pip install numpy)')
+    base_data, base_fmt = baseline
+    cands = candidates(family) + candidates('WEBP')
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda c: _evaluate(img, c, icc), cands))
+
+    same_family = [r for r in results if r['format'] == family and within_budget(r, min_ssim, min_psnr)]
+    best = min(same_family, key=lambda r: r['bytes'], default=None)
+    webp = min((r for r in results if r['format'] == 'WEBP' and within_budget(r, min_ssim, min_psnr)),
+               key=lambda r: r['bytes'], default=None)
+
+    strip = lambda r: {k: v for k, v in r.items() if k != 'data'} if r else None  # noqa: E731
+    report = {
+        'budget': {'min_ssim': min_ssim, 'min_psnr': min_psnr},
+        'baseline_bytes': len(base_data),
+        'candidates': len(results),
+        'webp_best': strip(webp),
+    }
+    if best is None or best['bytes'] >= len(base_data):
+        report.update({'chosen': 'baseline', 'bytes': len(base_data), 'saved_bytes': 0})
+        return base_data, base_fmt, report
+    report.update({'chosen': strip(best), 'bytes': best['bytes'], 'saved_bytes': len(base_data) - best['bytes']})
+    return best['data'], best['format'], report
@@ -0,0 +1,211 @@
+import os
+import json
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from PIL import Image, features
+
+import resize_covers as rc
+from cover_cache import CoverManifest, settings_key, sha256_file
+
+# Responsive widths for srcset; heights follow the TARGET_WIDTH:TARGET_HEIGHT ratio
+VARIANT_WIDTHS = (160, 320, 500, 1000)
+# Only browsers without WebP/AVIF use the original-format fallback. It is written
+# below the cover's own width; the cover itself is the widest fallback candidate,
+# so no full-size PNG copies ship next to it
+FALLBACK_MAX_WIDTH = rc.TARGET_WIDTH
+# Modern formats in <picture> preference order; the original format is the fallback
+MODERN_FORMATS = ('avif', 'webp')
+UPSCALE_VARIANTS = False  # never emit a width larger than the source
+
+VARIANTS_DIR = os.path.join(rc.COVERS_DIR, '_variants')
+MANIFEST_PATH = os.path.join(VARIANTS_DIR, 'manifest.json')
+
+
+def available_formats():
+    return [f for f in MODERN_FORMATS if features.check(f)]
+
+
+def variant_settings(formats):
+    return {
+        'widths': list(VARIANT_WIDTHS),
+        'formats': formats,
+        'aspect': [rc.TARGET_WIDTH, rc.TARGET_HEIGHT],
+        'jpeg_quality': rc.JPEG_QUALITY,
+        'png_compress_level': rc.PNG_COMPRESS_LEVEL,
+        'webp_quality': rc.WEBP_QUALITY,
+        'avif_quality': rc.AVIF_QUALITY,
+        'convert_to_srgb': rc.CONVERT_TO_SRGB,
+    }
+
+
+def source_for(rel, manifest):
+    # Prefer the pre-resize original so large variants are not upscaled from 500px,
+    # but only while the resize manifest says it is what the live cover was made from
+    live = os.path.join(rc.COVERS_DIR, rel)
+    backup = rc.backup_path_for(rel)
+    if manifest.holds_output(rel, live, rc.CACHE_STAGE) and manifest.source_for_repair(rel, rc.CACHE_STAGE, backup):
+        return backup
+    return live
+
+
+def site_path(path):
+    return 'covers/' + os.path.relpath(path, rc.COVERS_DIR).replace(os.sep, '/')
+
+
+def build_variants(rel, src, formats):
+    stem, ext = os.path.splitext(os.path.basename(rel))
+    out_dir = os.path.join(VARIANTS_DIR, stem)
+    os.makedirs(out_dir, exist_ok=True)
+
+    img = rc.load_image(src)
+    img, icc_bytes = rc.convert_to_srgb(img)
+    icc_bytes = icc_bytes or rc.SRGB_BYTES
+    src_w, src_h = img.size
+
+    widths = [w for w in VARIANT_WIDTHS if UPSCALE_VARIANTS or w <= min(src_w, src_h)]
+    if not widths:
+        widths = [min(src_w, src_h)]
+
+    variants = []
+    for w in widths:
+        h = round(w * rc.TARGET_HEIGHT / rc.TARGET_WIDTH)
+        resized = rc.resize_exact(img, (w, h))
+        fallback = [ext.lower()] if w < FALLBACK_MAX_WIDTH or w == widths[0] else []
+        for out_ext in fallback + ['.' + f for f in formats]:
+            dest = os.path.join(out_dir, f'{stem}-{w}{out_ext}')
+            fmt = rc.save_image(resized, dest, out_ext, icc_bytes)
+            variants.append({
+                'width': w,
+                'height': h,
+                'format': fmt.lower(),
+                'type': 'image/' + ('jpeg' if fmt == 'JPEG' else fmt.lower()),
+                'path': site_path(dest),
+                'bytes': os.path.getsize(dest),
+            })
+    # Widths or formats this build no longer produces
+    written = {os.path.basename(v['path']) for v in variants}
+    for name in os.listdir(out_dir):
+        if name not in written:
+            os.remove(os.path.join(out_dir, name))
+
+    cover = os.path.join(rc.COVERS_DIR, rel)
+    with Image.open(cover) as im:
+        fmt = im.format or ''
+        cover_info = {
+            'width': im.size[0],
+            'height': im.size[1],
+            'type': 'image/' + ('jpeg' if fmt == 'JPEG' else fmt.lower()),
+            'path': site_path(cover),
+        }
+    return {
+        'source': site_path(src),
+        'source_sha256': sha256_file(src),
+        'cover': cover_info,
+        'cover_sha256': sha256_file(cover),
+        'variants': variants,
+    }
+
+
+def srcsets(entry):
+    by_type = {}
+    for v in entry['variants']:
+        by_type.setdefault(v['type'], []).append(f"{v['path']} {v['width']}w")
+    # The cover completes its own format's fallback set at full width
+    cover = entry.get('cover')
+    widest = max((v['width'] for v in entry['variants'] if cover and v['type'] == cover['type']), default=None)
+    if widest is not None and cover['width'] > widest:
+        by_type[cover['type']].append(f"{cover['path']} {cover['width']}w")
+    return {t: ', '.join(items) for t, items in by_type.items()}
+
+
+def is_current(entry, key, rel, src, manifest):
+    """Variants match the settings, the chosen source and the live cover's content."""
+    if not entry or entry.get('settings') != key or entry['source'] != site_path(src):
+        return False
+    cover = os.path.join(rc.COVERS_DIR, rel)
+    if entry.get('cover_sha256') != manifest.digest(rel, cover):
+        return False
+    if src != cover and sha256_file(src) != entry['source_sha256']:
+        return False
+    root = os.path.dirname(rc.COVERS_DIR)
+    return all(os.path.exists(os.path.join(root, v['path'])) for v in entry['variants'])
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _build_one(args):
+    rel, src, formats = args
+    return rel, build_variants(rel, src, formats)
+
+
+def remove_stale(previous, rels):
+    """Delete variant directories of covers that no longer exist."""
+    live_stems = {os.path.splitext(os.path.basename(rel))[0] for rel in rels}
+    for rel in previous:
+        stem = os.path.splitext(os.path.basename(rel))[0]
+        if rel not in rels and stem not in live_stems:
+            shutil.rmtree(os.path.join(VARIANTS_DIR, stem), ignore_errors=True)
+
+
+def main(argv=None, pool=None):
+    parser = argparse.ArgumentParser(description='Generate responsive cover variants and a srcset manifest')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='worker processes (0 = one per CPU, 1 = serial)')
+    parser.add_argument('--force', action='store_true', help='rebuild every variant')
+    args = parser.parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    formats = available_formats()
+    key = settings_key(variant_settings(formats))
+    previous = load_manifest().get('covers', {})
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+
+    rels = [rel for _, rel in rc.iter_cover_files()]
+    remove_stale(previous, set(rels))
+    cover_manifest = CoverManifest(rc.MANIFEST_PATH)
+    covers = {}
+    todo = []
+    for rel in rels:
+        entry = previous.get(rel)
+        src = source_for(rel, cover_manifest)
+        if not args.force and is_current(entry, key, rel, src, cover_manifest):
+            covers[rel] = entry
+        else:
+            todo.append((rel, src, formats))
+
+    if jobs > 1 and len(todo) > 1:
+        with nullcontext(pool) if pool else ProcessPoolExecutor(max_workers=jobs) as pool:
+            built = list(pool.map(_build_one, todo))
+    else:
+        built = [_build_one(item) for item in todo]
+    for rel, entry in built:
+        entry['settings'] = key
+        entry['srcset'] = srcsets(entry)
+        covers[rel] = entry
+
+    manifest = {
+        'updatedAt': datetime.utcnow().isoformat() + 'Z',
+        'widths': list(VARIANT_WIDTHS),
+        'formats': formats,
+        'sizes': '(max-width: 600px) 50vw, 250px',
+        'covers': {rel: covers[rel] for rel in sorted(covers)},
+    }
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    total = sum(v['bytes'] for c in covers.values() for v in c['variants'])
+    print(f"Variants: {len(todo)} rebuilt, {len(covers) - len(todo)} current, {total} bytes total")
+    print(f"Manifest written to: {MANIFEST_PATH}")
+
+
+if __name__ == '__main__':
+    main()
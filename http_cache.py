@@ -0,0 +1,113 @@
+"""On-disk HTTP response cache shared by the link checker and the discography builder.
+
+Entries are keyed by (kind, url) and keep the status code, final redirect URL,
+ETag/Last-Modified validators and any values extracted from the body (e.g. a
+YouTube publish date). A fresh entry is served without touching the network; a
+stale one is revalidated with If-None-Match / If-Modified-Since, and a 304 just
+extends its lifetime.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from project_config import CONFIG
+
+DEFAULT_PATH = CONFIG.path_for("cache") / "http_cache.json"
+CACHE_VERSION = 1
+
+FOREVER = -1  # ttl value meaning "never expires"
+
+
+class HttpCache:
+    def __init__(self, path=DEFAULT_PATH, enabled=True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        if enabled:
+            self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION:
+            self.entries = data.get("entries", {})
+
+    def save(self):
+        if not self.enabled or not self.dirty:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"version": CACHE_VERSION, "entries": self.entries}, indent=2, sort_keys=True),
+                           encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+    @staticmethod
+    def _key(kind, url):
+        return f"{kind} {url}"
+
+    def get(self, kind, url):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self.entries.get(self._key(kind, url))
+            return dict(entry) if entry else None
+
+    @staticmethod
+    def is_fresh(entry, now=None):
+        if not entry:
+            return False
+        ttl = entry.get("ttl", 0)
+        if ttl == FOREVER:
+            return True
+        return (now or time.time()) - entry.get("fetched_at", 0) < ttl
+
+    @staticmethod
+    def validators(entry):
+        """Conditional request headers for revalidating `entry`."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, kind, url, resp=None, ttl=3600, status=None, final_url=None, values=None):
+        if not self.enabled:
+            return None
+        entry = {
+            "status": resp.status_code if resp is not None else status,
+            "final_url": str(resp.url) if resp is not None else (final_url or url),
+            "etag": resp.headers.get("ETag") if resp is not None else None,
+            "last_modified": resp.headers.get("Last-Modified") if resp is not None else None,
+            "values": values or {},
+            "fetched_at": time.time(),
+            "ttl": ttl,
+        }
+        with self._lock:
+            self.entries[self._key(kind, url)] = entry
+            self.dirty = True
+        return entry
+
+    def touch(self, kind, url, ttl=None, resp=None):
+        """Mark an entry revalidated (304): restart its TTL (optionally a new one) and refresh validators."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self.entries.get(self._key(kind, url))
+            if entry is None:
+                return None
+            entry["fetched_at"] = time.time()
+            if ttl is not None:
+                entry["ttl"] = ttl
+            if resp is not None:
+                entry["etag"] = resp.headers.get("ETag") or entry.get("etag")
+                entry["last_modified"] = resp.headers.get("Last-Modified") or entry.get("last_modified")
+            self.dirty = True
+            return dict(entry)
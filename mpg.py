@@ -0,0 +1,230 @@
+"""Run the MoneyPrinter G pipeline as one DAG, configured by mpg.json.
+
+    python mpg.py                          # every stage
+    python mpg.py --only links,discography
+    python mpg.py --since discography      # discography and everything downstream of it
+    python mpg.py --config ci.json --jobs 16
+    python mpg.py --watch                  # targeted rebuilds + live-reload server (see watch.py)
+
+A stage starts as soon as the stages it needs have finished, so the
+network-bound link check runs alongside CPU-bound cover encoding. The stages
+share one process pool (cover resize and variants) and one keep-alive HTTP
+session plus HTTP cache (link checks and publish-date lookups).
+"""
+import argparse
+import multiprocessing
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(1, str(ROOT / "build"))
+import project_config  # noqa: E402
+
+# stage -> stages whose outputs it reads
+STAGES = {
+    "links": (),  # link file -> links.json
+    "covers": (),  # covers/ upscale+fit in place, then _variants/
+    "discography": ("links", "covers"),  # links.json + covers + variant manifest -> discography.json, site-data/
+    "build": ("discography", "covers"),  # cover index, docs, dist/, release
+}
+
+
+class Shared:
+    """Worker pool and HTTP resources created on first use and shared by every stage."""
+
+    def __init__(self, config, jobs):
+        self.config = config
+        self.jobs = jobs
+        self._pool = None
+        self._http = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: other stages hold sockets and locks in threads; never fork those
+                self._pool = ProcessPoolExecutor(max_workers=self.jobs,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def http(self):
+        with self._lock:
+            if self._http is None:
+                import verify_and_update_links
+                from http_cache import HttpCache
+                size = max(self.config.stage("links")["workers"], self.config.stage("discography")["workers"])
+                self._http = (verify_and_update_links.make_session(size), HttpCache())
+            return self._http
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self._http is not None:
+            self._http[0].close()
+
+
+def run_links(shared):
+    import verify_and_update_links
+    opts = shared.config.stage("links")
+    argv = ["--workers", str(opts["workers"]), "--per-host", str(opts["per_host"]),
+            "--deadline", str(opts["deadline"])]
+    if opts["incremental"]:
+        argv.append("--incremental")
+    if not opts["cache"]:
+        argv.append("--no-cache")
+    sess, cache = shared.http()
+    verify_and_update_links.main(argv, sess=sess, cache=cache)
+
+
+def run_covers(shared):
+    import cover_variants
+    import resize_covers
+    opts = shared.config.stage("covers")
+    argv = ["--jobs", str(shared.jobs), "--mode", opts["mode"]]
+    if opts["tune"]:
+        argv.append("--tune")
+    resize_covers.main(argv, pool=shared.pool())
+    if opts["variants"]:
+        cover_variants.main(["--jobs", str(shared.jobs)], pool=shared.pool())
+
+
+def run_discography(shared):
+    import build_discography
+    sess, cache = shared.http()
+    build_discography.build(shared.config.stage("discography")["workers"], sess, cache)
+
+
+def run_build(shared):
+    import build
+    opts = shared.config.stage("build")
+    if opts["cover_index"]:
+        import cover_index
+        if cover_index.HAS_NUMPY:
+            cover_index.main([])
+        else:
+            print("cover_index skipped: numpy is not installed")
+    argv = [f"--{flag}" for flag in ("incremental", "release", "delta") if opts[flag]]
+    build.main(argv)
+
+
+RUNNERS = {"links": run_links, "covers": run_covers, "discography": run_discography, "build": run_build}
+
+
+def downstream(stage):
+    """The stage and every stage that depends on it, directly or not."""
+    out = {stage}
+    changed = True
+    while changed:
+        changed = False
+        for name, deps in STAGES.items():
+            if name not in out and out.intersection(deps):
+                out.add(name)
+                changed = True
+    return out
+
+
+def select(only=None, since=None):
+    """Stages to run, in dependency order."""
+    chosen = set(STAGES)
+    if only:
+        chosen = set(only)
+    if since:
+        chosen &= downstream(since)
+    return [s for s in STAGES if s in chosen]
+
+
+def run(stages, shared):
+    """Run `stages` concurrently as their dependencies allow; returns {stage: status}."""
+    status = {}
+    waiting = {s: [d for d in STAGES[s] if d in stages] for s in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(stages))) as ex:
+        while waiting or running:
+            for s, deps in list(waiting.items()):
+                if any(status.get(d) in ("failed", "skipped") for d in deps):
+                    del waiting[s]
+                    status[s] = "skipped"
+                    print(f"[mpg] {s}: skipped ({', '.join(deps)} did not finish)")
+                elif all(status.get(d) == "ok" for d in deps):
+                    del waiting[s]
+                    print(f"[mpg] {s}: started")
+                    running[ex.submit(_timed, s, shared)] = s
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in finished:
+                s = running.pop(f)
+                status[s], elapsed = f.result()
+                print(f"[mpg] {s}: {status[s]} in {elapsed:.1f}s")
+    return status
+
+
+def _timed(stage, shared):
+    import perf_trace
+    t0 = time.perf_counter()
+    try:
+        with perf_trace.TRACER.stage("mpg:" + stage):
+            RUNNERS[stage](shared)
+        result = "ok"
+    except (Exception, SystemExit):
+        traceback.print_exc()
+        result = "failed"
+    return result, time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the MoneyPrinter G pipeline (links, covers, discography, build)")
+    parser.add_argument("--config", help="config file (default: $MPG_CONFIG or mpg.json next to this script)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--only", help="comma-separated stages to run, without their dependencies")
+    group.add_argument("--since", choices=list(STAGES), help="run this stage and everything downstream of it")
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes for cover stages (default: config 'jobs')")
+    parser.add_argument("--dry-run", action="store_true", help="print the stages that would run and exit")
+    parser.add_argument("--watch", action="store_true",
+                        help="rebuild only what each change affects and serve dist/site with live reload")
+    parser.add_argument("--port", type=int, default=8000, help="dev server port for --watch")
+    parser.add_argument("--poll", action="store_true", help="--watch: poll for changes instead of using inotify")
+    parser.add_argument("--no-serve", action="store_true", help="--watch: rebuild only, without the dev server")
+    args = parser.parse_args(argv)
+
+    only = [s.strip() for s in args.only.split(",") if s.strip()] if args.only else None
+    unknown = sorted(set(only or ()) - set(STAGES))
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+    config = project_config.use(args.config)
+    stages = select(only, args.since)
+    if args.dry_run:
+        for s in stages:
+            deps = [d for d in STAGES[s] if d in stages]
+            print(s + (f" (after {', '.join(deps)})" if deps else ""))
+        return
+
+    import perf_trace
+    shared = Shared(config, args.jobs or config.jobs)
+    if args.watch:
+        import watch
+        try:
+            with perf_trace.hold("mpg"):
+                watch.run(shared, port=args.port, poll=args.poll, serve=not args.no_serve)
+        finally:
+            shared.close()
+            perf_trace.finish()
+        return
+    print(f"[mpg] root {config.root}; stages: {', '.join(stages)}; {shared.jobs} worker(s)")
+    try:
+        # One trace for the whole run; the stage entry points record into it
+        with perf_trace.hold("mpg"):
+            status = run(stages, shared)
+    finally:
+        shared.close()
+    perf_trace.finish()
+    if any(v != "ok" for v in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Lightweight timing/resource instrumentation shared by the build scripts.
+
+Every entry point records into the module-level `TRACER`:
+
+- stages and items: wall time, CPU time, resident memory at exit and its
+  change over the span, and the process's memory high-water mark so far
+- bytes read and written
+- HTTP requests (count, status, latency) via `instrument_session`
+
+Set `MPG_TRACE=<path>` to write the trace when the script finishes, and
+`MPG_TRACE_FORMAT=chrome` for Chrome trace-event format (chrome://tracing,
+Perfetto) instead of the plain JSON summary.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENV = "MPG_TRACE"
+TRACE_FORMAT_ENV = "MPG_TRACE_FORMAT"
+
+
+def current_rss_kb():
+    """Resident set size of this process right now, in KiB; None where /proc is missing."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_kb():
+    """High-water mark of this process and its reaped children so far, in KiB.
+
+    Cumulative: it never goes down, so inside one process it is not a per-stage
+    figure (spans report current_rss_kb() and its change for that).
+    """
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak = max(own, kids)
+    # ru_maxrss is bytes on macOS, KiB elsewhere
+    return peak // 1024 if os.uname().sysname == "Darwin" else peak
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+class Tracer:
+    def __init__(self, process=None):
+        self.process = process
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.events = []
+        self.requests = []
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def _now_us(self):
+        return (time.perf_counter() - self.t0) * 1e6
+
+    def record(self, cat, name, wall_ms, cpu_ms=None, start_us=None, **args):
+        """Add an externally measured event, e.g. an item timed inside a worker process."""
+        ev = {
+            "cat": cat,
+            "name": name,
+            "start_us": round(start_us if start_us is not None else self._now_us() - wall_ms * 1000, 1),
+            "wall_ms": round(wall_ms, 3),
+            "cpu_ms": round(cpu_ms, 3) if cpu_ms is not None else None,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(ev)
+        return ev
+
+    @contextmanager
+    def span(self, cat, name, **args):
+        # thread_time: CPU of the calling thread only, so concurrent spans don't double count
+        start_us = self._now_us()
+        cpu = time.thread_time()
+        rss0 = current_rss_kb()
+        ev_args = dict(args)
+        try:
+            yield ev_args
+        finally:
+            wall_ms = (self._now_us() - start_us) / 1000
+            rss1 = current_rss_kb()
+            ev_args.setdefault("rss_kb", rss1)
+            if rss0 is not None and rss1 is not None:
+                ev_args.setdefault("rss_delta_kb", rss1 - rss0)
+            ev_args.setdefault("max_rss_kb", peak_rss_kb())
+            self.record(cat, name, wall_ms, (time.thread_time() - cpu) * 1000, start_us, **ev_args)
+
+    def stage(self, name, **args):
+        return self.span("stage", name, **args)
+
+    def item(self, name, **args):
+        return self.span("item", name, **args)
+
+    def count_bytes(self, read=0, written=0):
+        with self._lock:
+            self.bytes_read += read or 0
+            self.bytes_written += written or 0
+
+    def record_request(self, method, url, status, latency_ms, nbytes=None):
+        with self._lock:
+            self.requests.append({
+                "method": method,
+                "url": url,
+                "status": status,
+                "latency_ms": round(latency_ms, 3),
+                "bytes": nbytes,
+                "at_us": round(self._now_us(), 1),
+            })
+
+    def instrument_session(self, session):
+        """Record every response (including redirect hops) seen by a requests.Session."""
+        def hook(resp, *args, **kwargs):
+            length = resp.headers.get("Content-Length")
+            self.record_request(resp.request.method, resp.url, resp.status_code,
+                                resp.elapsed.total_seconds() * 1000,
+                                int(length) if length and length.isdigit() else None)
+        session.hooks.setdefault("response", []).append(hook)
+        return session
+
+    def summary(self):
+        latencies = sorted(r["latency_ms"] for r in self.requests)
+        by_status = {}
+        for r in self.requests:
+            by_status[str(r["status"])] = by_status.get(str(r["status"]), 0) + 1
+        stages = {}
+        for ev in self.events:
+            if ev["cat"] != "stage":
+                continue
+            agg = stages.setdefault(ev["name"], {"count": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            agg["count"] += 1
+            agg["wall_ms"] = round(agg["wall_ms"] + ev["wall_ms"], 3)
+            agg["cpu_ms"] = round(agg["cpu_ms"] + (ev["cpu_ms"] or 0), 3)
+        return {
+            "process": self.process,
+            "started_at": self.started_at,
+            "wall_ms": round((time.perf_counter() - self.t0) * 1000, 3),
+            "cpu_ms": round((time.process_time() - self.cpu0) * 1000, 3),
+            "peak_rss_kb": peak_rss_kb(),
+            "bytes": {"read": self.bytes_read, "written": self.bytes_written},
+            "network": {
+                "requests": len(self.requests),
+                "by_status": by_status,
+                "latency_ms": {
+                    "total": round(sum(latencies), 3),
+                    "p50": _percentile(latencies, 0.50),
+                    "p95": _percentile(latencies, 0.95),
+                    "max": latencies[-1] if latencies else None,
+                },
+            },
+            "stages": stages,
+        }
+
+    def to_json(self):
+        return {**self.summary(), "events": self.events, "requests": self.requests}
+
+    def to_chrome(self):
+        pid = os.getpid()
+        events = [{
+            "name": ev["name"],
+            "cat": ev["cat"],
+            "ph": "X",
+            "ts": ev["start_us"],
+            "dur": round(ev["wall_ms"] * 1000, 1),
+            "pid": pid,
+            "tid": ev["tid"],
+            "args": {**ev["args"], "cpu_ms": ev["cpu_ms"]},
+        } for ev in self.events]
+        events += [{
+            "name": f"{r['method']} {r['status']}",
+            "cat": "http",
+            "ph": "X",
+            "ts": round(r["at_us"] - r["latency_ms"] * 1000, 1),
+            "dur": round(r["latency_ms"] * 1000, 1),
+            "pid": pid,
+            "tid": 0,
+            "args": {"url": r["url"], "bytes": r["bytes"]},
+        } for r in self.requests]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "metadata": self.summary()}
+
+    def write(self, path=None, fmt=None):
+        path = path or os.environ.get(TRACE_ENV)
+        if not path:
+            return None
+        fmt = (fmt or os.environ.get(TRACE_FORMAT_ENV) or "json").lower()
+        payload = self.to_chrome() if fmt == "chrome" else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        return path
+
+
+TRACER = Tracer()
+_held = False  # set by hold(): entry points share one trace owned by the caller
+
+
+def start(process):
+    """Name the current process's trace (one per entry point)."""
+    if not _held:
+        TRACER.process = process
+    return TRACER
+
+
+def finish():
+    """Write the trace if MPG_TRACE is set; deferred while held."""
+    if _held:
+        return None
+    return TRACER.write()
+
+
+@contextmanager
+def hold(process):
+    """Run several entry points in this process as one trace named `process`.
+
+    Inside the block their start() keeps the name and their finish() writes
+    nothing; the caller calls finish() once afterwards.
+    """
+    global _held
+    TRACER.process = process
+    _held = True
+    try:
+        yield TRACER
+    finally:
+        _held = False
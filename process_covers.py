@@ -1,80 +1,138 @@
 from pathlib import Path
-from PIL import Image
 import shutil
 import json
 import time
+import argparse
+from cover_cache import CoverManifest, MANIFEST_NAME, sha256_file
+import cover_engine
+from project_config import CONFIG
+import perf_trace
 
-COVERS_DIR = Path(r"c:\Users\Stack\Documents\trae_projects\moneyprinterg\covers")
+COVERS_DIR = CONFIG.path_for("covers")
 BACKUP_DIR = COVERS_DIR / "_backup_originals"
 METADATA_JSON = COVERS_DIR / "metadata.json"
+MANIFEST_PATH = COVERS_DIR / MANIFEST_NAME
+CACHE_STAGE = "upscale"
 
 MIN_SIZE = 1000  # minimum width and height
+JPEG_QUALITY = 85
 
 
 def ensure_backup_dir():
     BACKUP_DIR.mkdir(exist_ok=True)
 
 
-def upscale_if_needed(img_path: Path):
-    with Image.open(img_path) as im:
-        im.load()
-        w, h = im.size
-        fmt = (im.format or "").upper()
-        original = {"width": w, "height": h, "format": fmt}
+def cache_settings():
+    return {"min_size": MIN_SIZE, "jpeg_quality": JPEG_QUALITY}
+
+
+def save_kwargs_for(img_path: Path, fmt: str):
+    if fmt == "JPEG" or img_path.suffix.lower() in (".jpg", ".jpeg"):
+        return {"quality": JPEG_QUALITY, "optimize": True, "subsampling": 0}
+    return {"optimize": True}
 
-        # Determine if upscaling is needed
-        if w >= MIN_SIZE and h >= MIN_SIZE:
-            # Optionally optimize and resave to improve load performance
-            save_kwargs = {}
-            if fmt == "JPEG" or img_path.suffix.lower() in (".jpg", ".jpeg"):
-                save_kwargs = {"quality": 85, "optimize": True, "subsampling": 0}
-            else:
-                save_kwargs = {"optimize": True}
-            im.save(img_path, **save_kwargs)
-            return {"changed": False, **original, "width": w, "height": h}
 
-        # Compute scale to make both dimensions >= MIN_SIZE
-        scale = max(MIN_SIZE / w, MIN_SIZE / h)
-        new_w = int(round(w * scale))
-        new_h = int(round(h * scale))
+def upscale_if_needed(img_path: Path, src: Path = None):
+    src = src or img_path
+    data = src.read_bytes()
+    im = cover_engine.decode(data)
+    w, h = im.size
+    fmt = (im.format or "").upper()
+    original = {"width": w, "height": h, "format": fmt}
 
+    # Upscale (LANCZOS) so both dimensions are >= MIN_SIZE; no-op for large images
+    up, steps = cover_engine.apply_chain(im, "upscale", min_size=MIN_SIZE)
+    changed = "upscale" in steps
+    if changed:
         # Backup original
         backup_path = BACKUP_DIR / img_path.name
         if not backup_path.exists():
-            shutil.copy2(img_path, backup_path)
-
-        # Resize with high-quality filter
-        up = im.resize((new_w, new_h), Image.Resampling.LANCZOS)
-
-        # Save optimized
-        save_kwargs = {}
-        if fmt == "JPEG" or img_path.suffix.lower() in (".jpg", ".jpeg"):
-            save_kwargs = {"quality": 85, "optimize": True, "subsampling": 0}
-        else:
-            save_kwargs = {"optimize": True}
-        up.save(img_path, **save_kwargs)
+            shutil.copy2(src, backup_path)
+
+    if not changed:
+        # Large enough already: keep the bytes as they are, only a repair source is copied back
+        if src != img_path:
+            shutil.copy2(src, img_path)
+        return {"changed": False, **original, "width": w, "height": h}
+    up.save(img_path, format=fmt or None, **save_kwargs_for(img_path, fmt))
+    return {
+        "changed": True,
+        **original,
+        "width": up.size[0],
+        "height": up.size[1],
+        "format": fmt or ("JPEG" if img_path.suffix.lower() in (".jpg", ".jpeg") else "PNG"),
+    }
+
+
+def backup_for(p: Path):
+    return BACKUP_DIR / p.name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upscale covers below MIN_SIZE")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and reprocess every cover")
+    parser.add_argument("--repair", action="store_true", help="restore edited and deleted outputs from their recorded source backup")
+    parser.add_argument("--forget-missing", action="store_true",
+                        help="drop manifest records of deleted outputs instead of keeping them for --repair")
+    args = parser.parse_args(argv)
+    tracer = perf_trace.start("process_covers")
 
-        return {
-            "changed": True,
-            **original,
-            "width": new_w,
-            "height": new_h,
-            "format": fmt or ("JPEG" if img_path.suffix.lower() in (".jpg", ".jpeg") else "PNG"),
-        }
-
-
-def main():
     ensure_backup_dir()
+    manifest = CoverManifest(MANIFEST_PATH)
+    settings = cache_settings()
+    with tracer.stage("plan"):
+        live = {p.name: p for p in COVERS_DIR.iterdir()
+                if p.is_file() and p.suffix.lower() in (".png", ".jpg", ".jpeg")}
+        # Outputs deleted since the last run come back from their backup with --repair;
+        # their records are kept until then, or dropped with --forget-missing
+        missing, kept = [], set()
+        for name in sorted(manifest.files):
+            if name in live or CACHE_STAGE not in manifest.files[name].get("stages", {}):
+                continue
+            if args.forget_missing:
+                missing.append((name, "forgotten"))
+                continue
+            kept.add(name)
+            src, reason = manifest.repair_source(name, CACHE_STAGE, str(backup_for(COVERS_DIR / name)))
+            if src and args.repair:
+                live[name] = COVERS_DIR / name
+            elif src:
+                missing.append((name, "deleted; --repair restores it from its backup"))
+            else:
+                missing.append((name, f"deleted; cannot be restored: {reason}; --forget-missing drops it"))
+        manifest.prune(CACHE_STAGE, set(live) | kept)
+    for name, note in missing:
+        print(f"Missing output: {name} ({note})")
+
     meta = []
-    for p in sorted(COVERS_DIR.iterdir()):
-        if p.is_file() and p.suffix.lower() in (".png", ".jpg", ".jpeg"):
-            info = upscale_if_needed(p)
-            info.update({"filename": p.name})
+    processed = 0
+    with tracer.stage("process"):
+        for name in sorted(live):
+            p = live[name]
+            state = "new" if args.force else manifest.status(name, str(p), CACHE_STAGE, settings)
+            info = manifest.last_result(name, CACHE_STAGE) if state == "current" else None
+            if info is None:
+                src = p
+                if state == "missing" or (state == "edited" and args.repair):
+                    src = Path(manifest.source_for_repair(name, CACHE_STAGE, str(backup_for(p))) or p)
+                with tracer.item(name) as ev:
+                    ev["bytes_read"] = src.stat().st_size
+                    source_sha256 = sha256_file(src)
+                    info = upscale_if_needed(p, src)
+                    ev["bytes_written"] = p.stat().st_size if info["changed"] or src != p else 0
+                tracer.count_bytes(read=ev["bytes_read"], written=ev["bytes_written"])
+                info.update({"filename": p.name})
+                # An untouched cover is its own output; no need to hash it twice
+                output_sha256 = None if info["changed"] or src != p else source_sha256
+                manifest.record(name, str(p), CACHE_STAGE, settings, source_sha256, output_sha256, result=info)
+                processed += 1
             meta.append(info)
+    manifest.save()
     now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
     METADATA_JSON.write_text(json.dumps({"updatedAt": now, "covers": meta}, indent=2), encoding="utf-8")
-    print("Processed", len(meta), "images. Metadata written to", METADATA_JSON)
+    print("Processed", processed, "of", len(meta), "images. Metadata written to", METADATA_JSON)
+    perf_trace.finish()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,90 @@
+"""Project layout and pipeline settings, read from mpg.json.
+
+Scripts take their paths from `CONFIG` instead of hard-coding them, so they work
+from any checkout and any working directory. The config file is `$MPG_CONFIG`
+if set, else mpg.json next to this module. Relative paths resolve against the
+config file's directory ("root" moves the whole tree); keys missing from the
+file fall back to DEFAULTS.
+"""
+import json
+import os
+from pathlib import Path
+
+CONFIG_ENV = "MPG_CONFIG"
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent / "mpg.json"
+
+DEFAULTS = {
+    "root": ".",
+    "paths": {
+        "link_file": "MoneyPrinter G link.txt",
+        "links_json": "links.json",
+        "covers": "covers",
+        "discography": "discography.json",
+        "events": "events.json",
+        "site": "Moneyprinterg",
+        "site_data": "site-data",
+        "dist": "dist",
+        "docs": "docs",
+        "team_config": "config",
+        "project_doc": "MoneyPrinter G Official Fan Website.md",
+        "team_bundle": "team-fullstack.txt",
+        "cache": ".cache",
+    },
+    "jobs": 0,  # worker processes for CPU-bound stages (0 = one per CPU)
+    "stages": {
+        "links": {"workers": 8, "per_host": 2, "deadline": 180, "incremental": False, "cache": True},
+        "covers": {"mode": "upscale+fit", "tune": False, "variants": True},
+        "discography": {"workers": 8},
+        "build": {"cover_index": True, "incremental": True, "release": False, "delta": False},
+    },
+}
+
+
+def _merge(base, override):
+    out = dict(base)
+    for key, value in override.items():
+        out[key] = _merge(base[key], value) if isinstance(value, dict) and isinstance(base.get(key), dict) else value
+    return out
+
+
+class Config:
+    def __init__(self, data, path=None):
+        self.path = Path(path).resolve() if path else None
+        self.data = _merge(DEFAULTS, data)
+        base = self.path.parent if self.path else DEFAULT_CONFIG_PATH.parent
+        self.root = (base / self.data["root"]).resolve()
+
+    def path_for(self, key):
+        """Absolute path of a `paths` entry."""
+        return self.root / self.data["paths"][key]
+
+    def stage(self, name):
+        return dict(self.data["stages"].get(name, {}))
+
+    @property
+    def jobs(self):
+        return self.data["jobs"] or os.cpu_count() or 1
+
+
+def load(path=None):
+    """Read a config file; a missing default file just means every default applies."""
+    path = Path(path or os.environ.get(CONFIG_ENV) or DEFAULT_CONFIG_PATH)
+    if not path.exists() and path == DEFAULT_CONFIG_PATH:
+        return Config({})
+    return Config(json.loads(path.read_text(encoding="utf-8")), path)
+
+
+def use(path=None):
+    """Switch to another config before the pipeline modules are imported.
+
+    Also exported through $MPG_CONFIG so worker processes started afterwards
+    resolve the same project.
+    """
+    global CONFIG
+    CONFIG = load(path)
+    if CONFIG.path:
+        os.environ[CONFIG_ENV] = str(CONFIG.path)
+    return CONFIG
+
+
+CONFIG = load()
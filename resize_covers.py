@@ -1,13 +1,18 @@
 import os
 import json
+import time
 import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
 from datetime import datetime
-from PIL import Image, ImageOps
-try:
-    from PIL import ImageCms
-    HAS_CMS = True
-except Exception:
-    HAS_CMS = False
+import hashlib
+from cover_cache import CoverManifest, MANIFEST_NAME, sha256_file
+import cover_engine
+import cover_tuning
+from project_config import CONFIG
+import perf_trace
+from PIL import Image
 
 # Configuration — chosen to meet your requirements
 TARGET_WIDTH = 500   # pixels
@@ -17,27 +22,53 @@ OUTPUT_FORMAT = 'preserve'  # 'preserve' keeps original format per file
 JPEG_QUALITY = 92  # percent
 JPEG_SUBSAMPLING = 0  # 4:4:4 to avoid chroma softness
 PNG_COMPRESS_LEVEL = 6  # 0-9, Pillow default ~6
+WEBP_QUALITY = 82  # used for responsive variants (cover_variants.py)
+AVIF_QUALITY = 60
 CONVERT_TO_SRGB = True  # ensure consistent web color
+# 'fit' resizes only; 'upscale+fit' also applies process_covers' MIN_SIZE upscale in
+# the same decode, so running both scripts is no longer needed
+ENGINE_MODE = 'fit'
+UPSCALE_MIN_SIZE = 1000  # keep in step with process_covers.MIN_SIZE
 
-COVERS_DIR = os.path.abspath('covers')
+COVERS_DIR = str(CONFIG.path_for('covers'))
 BACKUP_DIR = os.path.join(COVERS_DIR, '_backup_resized_originals')
 REPORT_PATH = os.path.join(COVERS_DIR, 'resize_report.json')
+MANIFEST_PATH = os.path.join(COVERS_DIR, MANIFEST_NAME)
+CACHE_STAGE = 'resize'
 
 VALID_EXTS = {'.png', '.jpg', '.jpeg'}
+# Backups and generated responsive variants are never resized in place
+SKIP_DIR_NAMES = {'_backup_originals', '_backup_resized_originals', '_variants'}
+
+# Parallel mode: at most JOBS * MAX_IN_FLIGHT_PER_JOB files queued in the pool
+MAX_IN_FLIGHT_PER_JOB = 2
 
 
 def ensure_dirs():
     os.makedirs(BACKUP_DIR, exist_ok=True)
 
 
+def cache_settings(mode=ENGINE_MODE, tune=False):
+    # Everything that changes the bytes written for a given source
+    return {
+        'mode': mode,
+        'tune': [cover_tuning.MIN_SSIM, cover_tuning.MIN_PSNR] if tune else None,
+        'upscale_min_size': UPSCALE_MIN_SIZE if mode == 'upscale+fit' else None,
+        'width': TARGET_WIDTH,
+        'height': TARGET_HEIGHT,
+        'maintain_aspect': MAINTAIN_ASPECT,
+        'output_format': OUTPUT_FORMAT,
+        'jpeg_quality': JPEG_QUALITY,
+        'jpeg_subsampling': JPEG_SUBSAMPLING,
+        'png_compress_level': PNG_COMPRESS_LEVEL,
+        'convert_to_srgb': CONVERT_TO_SRGB,
+    }
+
+
 def get_srgb_profile_bytes():
-    if not CONVERT_TO_SRGB or not HAS_CMS:
-        return None
-    try:
-        srgb = ImageCms.createProfile('sRGB')
-        return srgb.tobytes()
-    except Exception:
+    if not CONVERT_TO_SRGB:
         return None
+    return cover_engine.SRGB_BYTES
 
 
 SRGB_BYTES = get_srgb_profile_bytes()
@@ -52,42 +83,14 @@ def load_image(path):
 def convert_to_srgb(img):
     if not CONVERT_TO_SRGB:
         return img, None
-    if not HAS_CMS:
-        # Fallback: simply ensure an RGB/RGBA mode
-        if img.mode not in ('RGB', 'RGBA'):
-            img = img.convert('RGB')
-        return img, None
-    try:
-        # If ICC present, attempt transform to sRGB
-        icc = img.info.get('icc_profile')
-        if icc:
-            src = ImageCms.getOpenProfile(io.BytesIO(icc))
-            dst = ImageCms.createProfile('sRGB')
-            intent = ImageCms.INTENT_PERCEPTUAL
-            img = ImageCms.profileToProfile(img, src, dst, renderingIntent=intent, outputMode='RGB')
-            return img, dst.tobytes()
-        else:
-            # No ICC; just convert to RGB
-            if img.mode not in ('RGB', 'RGBA'):
-                img = img.convert('RGB')
-            return img, SRGB_BYTES
-    except Exception:
-        # Robust fallback
-        if img.mode not in ('RGB', 'RGBA'):
-            img = img.convert('RGB')
-        return img, SRGB_BYTES
+    # ICC sources go through a transform cached per profile; others just become RGB/RGBA
+    return cover_engine.to_srgb(img)
 
 
-def resize_exact(img):
+def resize_exact(img, size=None):
     # Use high-quality LANCZOS for resizing; center crop to exact target
-    size = (TARGET_WIDTH, TARGET_HEIGHT)
-    method = Image.LANCZOS
-    if MAINTAIN_ASPECT:
-        # Fit to cover, cropping as needed
-        return ImageOps.fit(img, size, method=method, centering=(0.5, 0.5))
-    else:
-        # Distort to exact size (not recommended)
-        return img.resize(size, resample=method)
+    size = size or (TARGET_WIDTH, TARGET_HEIGHT)
+    return cover_engine.fit(img, size, MAINTAIN_ASPECT)
 
 
 def save_image(img, dest_path, orig_ext, srgb_bytes):
@@ -95,7 +98,18 @@ def save_image(img, dest_path, orig_ext, srgb_bytes):
     fmt = None
     params = {}
 
-    if OUTPUT_FORMAT == 'preserve':
+    if ext in ('.webp', '.avif'):
+        # Modern formats are only written for variants; always honour the extension
+        fmt = ext[1:].upper()
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+        if fmt == 'WEBP':
+            params = {'quality': WEBP_QUALITY, 'method': 6}
+        else:
+            params = {'quality': AVIF_QUALITY}
+        if srgb_bytes:
+            params['icc_profile'] = srgb_bytes
+    elif OUTPUT_FORMAT == 'preserve':
         if ext == '.png':
             fmt = 'PNG'
             params = {
@@ -145,7 +159,19 @@ def save_image(img, dest_path, orig_ext, srgb_bytes):
     return fmt
 
 
-def process_file(path, rel):
+def process_file(path, rel, src=None, mode=ENGINE_MODE, tune=False, refresh_backup=False):
+    started = time.perf_counter()
+    cpu = time.process_time()
+    src = src or path
+    res = _process_file(path, rel, src, mode, tune, refresh_backup)
+    if res:
+        res['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        res['cpu_ms'] = round((time.process_time() - cpu) * 1000, 2)
+        res['rss_kb'] = perf_trace.current_rss_kb()  # of the worker that did the item
+    return res
+
+
+def _process_file(path, rel, src, mode, tune=False, refresh_backup=False):
     name = os.path.basename(path)
     root, ext = os.path.splitext(name)
 
@@ -153,57 +179,164 @@ def process_file(path, rel):
     if rel.startswith('_backup_originals') or name.lower() in {'metadata.json'}:
         return None
 
-    # Backup original
+    # Backup original; replaced art replaces it, since variants and --repair read it
     backup_path = os.path.join(BACKUP_DIR, name)
-    if not os.path.exists(backup_path):
-        shutil.copy2(path, backup_path)
-
-    # Load, convert color, resize
-    img = load_image(path)
+    if refresh_backup or not os.path.exists(backup_path):
+        shutil.copy2(src, backup_path)
+
+    # Read once: the same bytes feed the hash and the (possibly reduced) decode
+    with open(src, 'rb') as f:
+        data = f.read()
+    source_sha256 = hashlib.sha256(data).hexdigest()
+    target = (TARGET_WIDTH, TARGET_HEIGHT)
+    img = cover_engine.decode(data, target)
     img, icc_bytes = convert_to_srgb(img)
-    resized = resize_exact(img)
-
-    # Save back to original path (preserving extension)
-    fmt = save_image(resized, path, ext, icc_bytes or SRGB_BYTES)
-
-    # Validation
-    valid = True
-    issues = []
-    try:
-        chk = load_image(path)
-        w, h = chk.size
-        if (w, h) != (TARGET_WIDTH, TARGET_HEIGHT):
-            valid = False
-            issues.append(f'Dimension mismatch: got {w}x{h}')
-        # Format check
-        if fmt == 'PNG' and chk.format != 'PNG':
-            valid = False
-            issues.append(f'Format mismatch: expected PNG, got {chk.format}')
-        if fmt == 'JPEG' and chk.format != 'JPEG':
-            valid = False
-            issues.append(f'Format mismatch: expected JPEG, got {chk.format}')
-        # Color profile presence (best-effort)
-        icc_present = bool(chk.info.get('icc_profile'))
-    except Exception as e:
-        valid = False
-        issues.append(f'Validation error: {e}')
-        w = h = None
-        icc_present = False
+    resized, steps = cover_engine.apply_chain(img, mode, target, UPSCALE_MIN_SIZE, MAINTAIN_ASPECT)
+
+    # Encode in memory, validate from the encoder output, then write once
+    icc = icc_bytes or SRGB_BYTES
+    out, fmt = cover_engine.encode(resized, save_image, ext, icc)
+    tuning = None
+    if tune:
+        # Smallest same-format encoding within the perceptual budget; baseline otherwise
+        out, fmt, tuning = cover_tuning.tune(resized, fmt, (out, fmt), icc)
+    valid, issues = cover_engine.validate(resized, out, fmt, target)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(out)
+    os.replace(tmp, path)
 
     return {
         'file': rel,
         'original_ext': ext,
         'format_saved': fmt,
-        'width': w,
-        'height': h,
-        'icc_profile_embedded': icc_present,
+        'width': resized.size[0],
+        'height': resized.size[1],
+        'icc_profile_embedded': cover_engine.embedded_icc(out),
         'validation_passed': valid,
         'issues': issues,
-        'size_bytes': os.path.getsize(path),
+        'size_bytes': len(out),
+        'source_bytes': len(data),
+        'engine_steps': steps,
+        'tuning': tuning,
+        'source_sha256': source_sha256,
+        'sha256': hashlib.sha256(out).hexdigest(),
     }
 
 
-def main():
+def iter_cover_files():
+    for root, dirs, files in os.walk(COVERS_DIR):
+        # Skip backup and variant directories
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIR_NAMES)
+        for fname in sorted(files):
+            ext = os.path.splitext(fname)[1].lower()
+            if ext in VALID_EXTS:
+                full = os.path.join(root, fname)
+                yield full, os.path.relpath(full, COVERS_DIR)
+
+
+def plan_work(manifest, force=False, repair=False, mode=ENGINE_MODE, tune=False, forget_missing=False):
+    """Split covers into cached results, (path, rel, src, state, refresh_backup) work
+    items and (rel, note) for outputs deleted since the last run.
+
+    A deleted output is restored from its backup only with `repair`. Its manifest
+    record is kept until that succeeds, or dropped with `forget_missing`.
+    """
+    settings = cache_settings(mode, tune)
+    cached, todo, live = [], [], set()
+    for full, rel in iter_cover_files():
+        live.add(rel)
+        state = 'new' if force else manifest.status(rel, full, CACHE_STAGE, settings)
+        if state == 'current':
+            res = manifest.last_result(rel, CACHE_STAGE)
+            if res:
+                # The recorded timings belong to the run that did the work
+                res.update(cache='hit', elapsed_ms=0, cpu_ms=0)
+                cached.append(res)
+                continue
+        src = full
+        if state == 'edited' and repair:
+            src = manifest.source_for_repair(rel, CACHE_STAGE, backup_path_for(rel)) or full
+        # New art in a cover we processed before: its backup is out of date. Without
+        # a record the file may be our own earlier output, so the backup is kept
+        refresh = (src == full and CACHE_STAGE in manifest.files.get(rel, {}).get('stages', {})
+                   and not manifest.holds_output(rel, full, CACHE_STAGE))
+        todo.append((full, rel, src, state, refresh))
+    missing = []
+    for rel in sorted(set(manifest.files) - live):
+        if CACHE_STAGE not in manifest.files[rel].get('stages', {}):
+            continue
+        if forget_missing:
+            missing.append((rel, 'forgotten'))
+            continue
+        live.add(rel)
+        src, reason = manifest.repair_source(rel, CACHE_STAGE, backup_path_for(rel))
+        if src and repair:
+            todo.append((os.path.join(COVERS_DIR, rel), rel, src, 'missing', False))
+        elif src:
+            missing.append((rel, 'deleted; --repair restores it from its backup'))
+        else:
+            missing.append((rel, f'deleted; cannot be restored: {reason}; --forget-missing drops it'))
+    manifest.prune(CACHE_STAGE, live)
+    return cached, todo, missing
+
+
+def backup_path_for(rel):
+    return os.path.join(BACKUP_DIR, os.path.basename(rel))
+
+
+def run_serial(items, mode=ENGINE_MODE, tune=False):
+    results = []
+    for full, rel, src, refresh in items:
+        res = process_file(full, rel, src, mode, tune, refresh)
+        if res:
+            results.append(res)
+    return results
+
+
+def run_parallel(items, jobs, mode=ENGINE_MODE, tune=False, pool=None):
+    # Bounded submission: never queue more than jobs * MAX_IN_FLIGHT_PER_JOB
+    # files at once so memory stays flat on large catalogs.
+    # A caller-owned pool (mpg.py) is used as is and left running.
+    results = []
+    max_in_flight = max(1, jobs * MAX_IN_FLIGHT_PER_JOB)
+    items = iter(items)
+    with nullcontext(pool) if pool else ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = set()
+        for full, rel, src, refresh in items:
+            pending.add(pool.submit(process_file, full, rel, src, mode, tune, refresh))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(f.result() for f in done)
+        done, _ = wait(pending)
+        results.extend(f.result() for f in done)
+    return [r for r in results if r]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Resize covers to the target size')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='worker processes (0 = one per CPU, 1 = serial)')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the manifest and reprocess every cover')
+    parser.add_argument('--repair', action='store_true',
+                        help='restore edited and deleted outputs from their recorded source backup')
+    parser.add_argument('--forget-missing', action='store_true',
+                        help='drop manifest records of deleted outputs instead of keeping them for --repair')
+    parser.add_argument('--mode', choices=('fit', 'upscale+fit'), default=ENGINE_MODE,
+                        help="'upscale+fit' fuses process_covers' upscale into the same decode")
+    parser.add_argument('--tune', action='store_true',
+                        help='search JPEG/PNG-palette/WebP encodings for the smallest within the SSIM/PSNR budget (needs numpy)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None, pool=None):
+    args = parse_args(argv)
+    if args.tune and not cover_tuning.HAS_NUMPY:
+        raise SystemExit('--tune needs numpy: pip install numpy')
+    tracer = perf_trace.start('resize_covers')
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
     ensure_dirs()
     report = {
         'run_at': datetime.utcnow().isoformat() + 'Z',
@@ -215,36 +348,63 @@ def main():
             'jpeg_quality': JPEG_QUALITY,
             'png_compress_level': PNG_COMPRESS_LEVEL,
             'convert_to_srgb': CONVERT_TO_SRGB,
+            'mode': args.mode,
+            'tune': args.tune,
         },
+        'jobs': jobs,
         'results': [],
     }
 
-    for root, dirs, files in os.walk(COVERS_DIR):
-        # Skip backup directories
-        if os.path.basename(root) in {'_backup_originals', '_backup_resized_originals'}:
-            continue
-        for fname in files:
-            ext = os.path.splitext(fname)[1].lower()
-            if ext in VALID_EXTS:
-                full = os.path.join(root, fname)
-                rel = os.path.relpath(full, COVERS_DIR)
-                res = process_file(full, rel)
-                if res:
-                    report['results'].append(res)
+    started = time.perf_counter()
+    manifest = CoverManifest(MANIFEST_PATH)
+    with tracer.stage('plan'):
+        cached, todo, missing = plan_work(manifest, force=args.force, repair=args.repair, mode=args.mode,
+                                          tune=args.tune, forget_missing=args.forget_missing)
+    for rel, note in missing:
+        print(f"Missing output: {rel} ({note})")
+    states = {rel: state for _, rel, _, state, _ in todo}
+    items = [(full, rel, src, refresh) for full, rel, src, _, refresh in todo]
+    with tracer.stage('process', jobs=jobs, files=len(items)):
+        if jobs > 1 and len(items) > 1:
+            results = run_parallel(items, jobs, args.mode, args.tune, pool)
+        else:
+            results = run_serial(items, args.mode, args.tune)
+    settings = cache_settings(args.mode, args.tune)
+    for res in results:
+        # Items may have run in worker processes; record their own measurements
+        tracer.record('item', res['file'], res['elapsed_ms'], res['cpu_ms'], rss_kb=res.pop('rss_kb', None),
+                      bytes_read=res['source_bytes'], bytes_written=res['size_bytes'])
+        tracer.count_bytes(read=res['source_bytes'], written=res['size_bytes'])
+        res['cache'] = states.get(res['file'], 'new')
+        manifest.record(res['file'], os.path.join(COVERS_DIR, res['file']), CACHE_STAGE, settings,
+                        res['source_sha256'], res['sha256'], result=res)
+    manifest.save()
+    results.extend(cached)
+    # Completion order varies in parallel mode; keep the report stable
+    results.sort(key=lambda r: r['file'])
+    report['results'] = results
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
 
     # Aggregate validation status
     report['summary'] = {
         'total': len(report['results']),
+        'processed': len(todo),
+        'cached': len(cached),
+        'missing': len(missing),
         'passed': sum(1 for r in report['results'] if r['validation_passed']),
         'failed': sum(1 for r in report['results'] if not r['validation_passed']),
     }
+    if args.tune:
+        report['summary']['tuning_saved_bytes'] = sum((r.get('tuning') or {}).get('saved_bytes', 0)
+                                                      for r in report['results'])
 
     with open(REPORT_PATH, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=2)
 
     print(f"Resize completed. Report written to: {REPORT_PATH}")
     print(json.dumps(report['summary'], indent=2))
+    perf_trace.finish()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "benchmarks"))
+
+from stub_server import StubServer  # noqa: E402
+
+
+@pytest.fixture
+def stub_server():
+    """Local HTTP server with redirect, flaky, error and slow routes (benchmarks/stub_server.py)."""
+    with StubServer(latency=0) as server:
+        yield server
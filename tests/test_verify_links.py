@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+import verify_and_update_links as links
+
+# URLs that contain a second scheme but are a single link
+EMBEDDED_SCHEME_URLS = (
+    "https://l.facebook.com/l.php?u=https://www.youtube.com/watch?v=abc&h=AT0",
+    "https://www.google.com/url?q=https://open.spotify.com/track/1&sa=D",
+    "https://web.archive.org/web/2024/https://example.com/page",
+    "https://example.com/share#next=https://example.org/",
+)
+
+
+def test_embedded_scheme_round_trip():
+    text = "".join(f"Track {i}\n{url}\nStatus: OK\n\n" for i, url in enumerate(EMBEDDED_SCHEME_URLS))
+    doc = links.parse_link_file(text)
+    assert [e["url"] for e in doc["entries"]] == list(EMBEDDED_SCHEME_URLS)
+    assert links.render_link_file(doc) == text
+    assert links.render_link_file(doc, {i: "OK" for i in range(len(doc["entries"]))}) == text
+
+
+def test_glued_urls_split():
+    first = "https://www.youtube.com/watch?v=abcDEF123"
+    doc = links.parse_link_file(f"Track\n{first}https://www.youtube.com/watch?v=xyz\n")
+    assert doc["entries"][0]["url"] == first
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_errors_are_retried(stub_server, status):
+    # The stub sends Retry-After: 0, so retries don't wait
+    key = f"/flaky?id={status}"
+    res = links.check_url(f"{stub_server.base_url}{key}&fail=2&status={status}", links.make_session(2))
+    assert res["ok"] and res["status"] == 200
+    assert stub_server.hits[key] > 2
+
+
+def test_persistent_errors_give_up(stub_server):
+    res = links.check_url(stub_server.base_url + "/error", links.make_session(2))
+    assert not res["ok"] and res["status"] == 500
+    # HEAD then GET per attempt
+    assert stub_server.hits["/error"] == 2 * (links.MAX_RETRIES + 1)
+
+
+def test_redirects_are_followed(stub_server):
+    res = links.check_url(stub_server.base_url + "/redirect?to=/landing", links.make_session(2))
+    assert res["ok"] and res["final_url"] == stub_server.base_url + "/landing"
+    assert stub_server.hits["/landing"] == 1
+
+
+def test_deadline_is_respected(stub_server):
+    t0 = time.monotonic()
+    res = links.check_urls([stub_server.base_url + "/slow?s=5"], deadline_s=0.5)
+    elapsed = time.monotonic() - t0
+    (result,) = res.values()
+    assert not result["ok"] and result["status"] is None and "error" in result
+    assert elapsed < 2
+
+
+def test_per_host_limit(stub_server):
+    urls = [f"{stub_server.base_url}/slow?s=0.1&n={i}" for i in range(8)]
+    res = links.check_urls(urls, workers=8, per_host=2, deadline_s=0)
+    assert all(r["ok"] for r in res.values())
+    assert stub_server.max_in_flight == 2
+
+
+def test_incremental_reuses_only_healthy_results(tmp_path):
+    path = tmp_path / "links.json"
+    path.write_text('{"links": [{"url": "https://a.example/", "ok": true, "status": 200},'
+                    ' {"url": "https://b.example/", "ok": false, "status": null}]}', encoding="utf-8")
+    assert list(links.load_previous_results(path)) == ["https://a.example/"]
@@ -1,99 +1,330 @@
 import re
 import json
 import time
-from pathlib import Path
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+from http_cache import HttpCache
+from project_config import CONFIG
+import perf_trace
 
-LINKS_PATH = Path(r"c:\Users\Stack\Documents\trae_projects\moneyprinterg\MoneyPrinter G link.txt")
-OUTPUT_JSON = Path(r"c:\Users\Stack\Documents\trae_projects\moneyprinterg\links.json")
+LINKS_PATH = CONFIG.path_for("link_file")
+OUTPUT_JSON = CONFIG.path_for("links_json")
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-session = requests.Session()
-session.headers.update({"User-Agent": USER_AGENT})
+HEAD_TIMEOUT = 15
+GET_TIMEOUT = 20
+MAX_WORKERS = 8  # global concurrency cap
+PER_HOST_LIMIT = 2  # concurrent requests per host
+MAX_RETRIES = 3  # extra attempts for 429/5xx and connection errors
+BACKOFF_BASE = 0.5  # seconds; doubled per attempt with full jitter
+BACKOFF_CAP = 8.0
+DEADLINE = 180.0  # seconds for the whole run
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CACHE_KIND = "link"
+LINK_TTL = 24 * 3600  # healthy links are trusted for a day, then revalidated
 
 
-def parse_links(text: str):
-    lines = [l.strip() for l in text.splitlines()]
-    pairs = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith("http"):
-            url = line
-            # fix a common duplication issue (two https... concatenated)
-            if url.count("https://www.youtube.com") > 1:
-                first = url.find("https://www.youtube.com")
-                second = url.find("https://www.youtube.com", first + 1)
-                url = url[:second]
-            # find next non-empty line as title
-            j = i + 1
-            title = None
-            while j < len(lines):
-                if lines[j]:
-                    title = lines[j]
-                    break
-                j += 1
-            if title:
-                pairs.append({"title": title, "url": url})
-                i = j + 1
+def make_session(pool_size=MAX_WORKERS):
+    s = requests.Session()
+    s.headers.update({"User-Agent": USER_AGENT})
+    # Keep-alive pool large enough for every worker so connections are reused
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return perf_trace.TRACER.instrument_session(s)
+
+
+session = make_session()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class HostLimiter:
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._sems = {}
+
+    def get(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+
+# Link file: blocks of "Title / URL / Status: ..." lines separated by blank lines.
+# Older raw lists put the title on the line after the URL; both layouts parse.
+STATUS_LINE = re.compile(r"status:\s*(.*)$", re.I)
+URL_START = re.compile(r"https?://")
+# A second URL pasted straight onto the end of the first one: the scheme follows
+# a plain path/value character. After "=", "/", "?", "&", "#" etc. it is part of
+# the URL (redirect targets like ?u=https://..., archive links) and is kept
+GLUED_URL = re.compile(r"(?<=[\w.~-])https?://")
+
+
+def tokenize(text: str):
+    """Classify each line once: yields (kind, raw line, value), kind in blank/url/status/text."""
+    for raw in text.splitlines():
+        s = raw.strip()
+        if not s:
+            yield "blank", raw, ""
+        elif URL_START.match(s):
+            # Repair two URLs pasted together: keep the first (a single forward scan)
+            nxt = GLUED_URL.search(s, 1)
+            yield "url", raw, s[:nxt.start()] if nxt else s
+        else:
+            m = STATUS_LINE.match(s)
+            if m:
+                yield "status", raw, m.group(1)
             else:
-                # URL with no title (artist pages at end)
-                pairs.append({"title": "Untitled", "url": url})
-                i += 1
+                yield "text", raw, s
+
+
+def parse_link_file(text: str):
+    """Parse the link file in one pass, keeping every line for a lossless round trip.
+
+    Returns {"lines": [[kind, raw, value]], "entries": [...], "trailing_newline": bool}.
+    Each entry has title/url/status plus the indices of the lines they came from;
+    a status line is metadata of the entry above it and is never taken as a title.
+    """
+    lines = []
+    entries = []
+    cur = None  # entry still collecting its title-after / status lines
+    pending = None  # first text line of the current block, title of the next URL
+    prev_kind = "blank"
+    for idx, (kind, raw, value) in enumerate(tokenize(text)):
+        lines.append([kind, raw, value])
+        if kind == "blank":
+            cur, pending = None, None
+        elif kind == "url":
+            cur = {"title": pending[0] if pending else None, "url": value,
+                   "title_line": pending[1] if pending else None, "url_line": idx,
+                   "status": None, "status_line": None, "anchor": idx}
+            entries.append(cur)
+            pending = None
+        elif kind == "status":
+            if cur and cur["status_line"] is None:
+                cur["status"], cur["status_line"], cur["anchor"] = value, idx, idx
+        elif cur and cur["title"] is None and cur["status_line"] is None and prev_kind == "url":
+            # Legacy layout: URL first, title on the next line
+            cur["title"], cur["title_line"], cur["anchor"] = value, idx, idx
+        elif pending is None:
+            pending = (value, idx)
+        prev_kind = kind
+    return {"lines": lines, "entries": entries, "trailing_newline": text.endswith(("\n", "\r"))}
+
+
+def render_link_file(doc, statuses=None):
+    """Inverse of parse_link_file; `statuses` (entry index -> text) updates status lines in place.
+
+    Without statuses the original text is reproduced exactly. Entries that had
+    no status line get one right after their last line.
+    """
+    statuses = statuses or {}
+    replace, insert = {}, {}
+    for i, e in enumerate(doc["entries"]):
+        if i not in statuses:
+            continue
+        if e["status_line"] is not None:
+            if statuses[i] != e["status"]:
+                replace[e["status_line"]] = f"Status: {statuses[i]}"
         else:
-            i += 1
-    # Append explicit artist links if present but not parsed with titles
-    if "apple.com" in text and not any("Apple Music" in p["title"] for p in pairs):
-        # Find Apple link
-        m = re.search(r"(https://music\.apple\.com/\S+)", text)
-        if m:
-            pairs.append({"title": "Apple Music (Artist)", "url": m.group(1)})
-    if "open.spotify.com" in text and not any("Spotify" in p["title"] for p in pairs):
-        m = re.search(r"(https://open\.spotify\.com/\S+)", text)
-        if m:
-            pairs.append({"title": "Spotify (Artist)", "url": m.group(1)})
-    return pairs
-
-
-def check_url(url: str):
+            insert.setdefault(e["anchor"], []).append(f"Status: {statuses[i]}")
+    out = []
+    for idx, (_, raw, _) in enumerate(doc["lines"]):
+        out.append(replace.get(idx, raw))
+        out.extend(insert.get(idx, ()))
+    text = "\n".join(out)
+    return text + "\n" if doc["trailing_newline"] or not out else text
+
+
+def parse_links(text: str):
+    return [{"title": e["title"], "url": e["url"]} for e in parse_link_file(text)["entries"]]
+
+
+def _remaining(deadline):
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    return left
+
+
+def _timeout(limit, deadline):
+    left = _remaining(deadline)
+    return limit if left is None else min(limit, left)
+
+
+def _backoff(attempt, resp=None):
+    # Honour Retry-After seconds from 429/503, otherwise exponential with full jitter
+    if resp is not None:
+        ra = resp.headers.get("Retry-After", "")
+        if ra.isdigit():
+            return min(float(ra), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _sleep(seconds, deadline):
+    left = _remaining(deadline)
+    time.sleep(seconds if left is None else min(seconds, left))
+
+
+def _fetch(url, sess, deadline, headers=None):
+    # Use HEAD first; if not allowed, fall back to GET
+    resp = sess.head(url, allow_redirects=True, timeout=_timeout(HEAD_TIMEOUT, deadline), headers=headers)
+    if resp.status_code >= 400 or resp.status_code == 405:
+        resp.close()
+        resp = sess.get(url, allow_redirects=True, timeout=_timeout(GET_TIMEOUT, deadline), stream=True,
+                        headers=headers)
+        resp.close()  # only the status and final URL matter; don't download the body
+    return resp
+
+
+def _cached_result(entry):
+    return {"ok": 200 <= entry["status"] < 300, "status": entry["status"], "final_url": entry["final_url"]}
+
+
+def check_url(url: str, sess=None, deadline=None, limiter=None, cache=None, refresh=False):
+    entry = cache.get(CACHE_KIND, url) if cache else None
+    if entry and not refresh and HttpCache.is_fresh(entry):
+        return _cached_result(entry)
+    headers = HttpCache.validators(entry)
+    sess = sess or session
+    sem = limiter.get(url) if limiter else None
+    attempt = 0
+    while True:
+        try:
+            if sem:
+                with sem:
+                    resp = _fetch(url, sess, deadline, headers)
+            else:
+                resp = _fetch(url, sess, deadline, headers)
+            if resp.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                _sleep(_backoff(attempt, resp), deadline)
+                attempt += 1
+                continue
+            if resp.status_code == 304 and entry:
+                return _cached_result(cache.touch(CACHE_KIND, url, resp=resp))
+            ok = 200 <= resp.status_code < 300
+            final_url = str(resp.url)
+            if cache and ok:
+                cache.store(CACHE_KIND, url, resp, ttl=LINK_TTL)
+            return {"ok": ok, "status": resp.status_code, "final_url": final_url}
+        except DeadlineExceeded as e:
+            return {"ok": False, "status": None, "error": str(e), "final_url": url}
+        except requests.RequestException as e:
+            if attempt < MAX_RETRIES:
+                try:
+                    _sleep(_backoff(attempt), deadline)
+                except DeadlineExceeded as de:
+                    return {"ok": False, "status": None, "error": str(de), "final_url": url}
+                attempt += 1
+                continue
+            return {"ok": False, "status": None, "error": str(e), "final_url": url}
+        except Exception as e:
+            return {"ok": False, "status": None, "error": str(e), "final_url": url}
+
+
+def _timed_check(url, *args):
+    with perf_trace.TRACER.item(url) as ev:
+        res = check_url(url, *args)
+        ev["status"] = res["status"]
+        return res
+
+
+def check_urls(urls, workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, deadline_s=DEADLINE, sess=None,
+               cache=None, refresh=False):
+    """Check each distinct URL once, concurrently; returns {url: result}."""
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return {}
+    sess = sess or (session if workers <= MAX_WORKERS else make_session(workers))
+    limiter = HostLimiter(per_host)
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {u: pool.submit(_timed_check, u, sess, deadline, limiter, cache, refresh) for u in unique}
+        return {u: f.result() for u, f in futures.items()}
+
+
+def status_text(result):
+    return "OK" if result["ok"] else f"BAD ({result['status']})"
+
+
+def load_previous_results(path=None):
+    """url -> check result from the last links.json, for --incremental.
+
+    Only healthy links are reused; failed and timed-out ones are checked again.
+    """
     try:
-        # Use HEAD first; if not allowed, fall back to GET
-        resp = session.head(url, allow_redirects=True, timeout=15)
-        if resp.status_code >= 400 or resp.status_code == 405:
-            resp = session.get(url, allow_redirects=True, timeout=20)
-        ok = 200 <= resp.status_code < 300
-        final_url = str(resp.url)
-        return {"ok": ok, "status": resp.status_code, "final_url": final_url}
-    except Exception as e:
-        return {"ok": False, "status": None, "error": str(e), "final_url": url}
-
-
-def main():
-    raw = LINKS_PATH.read_text(encoding="utf-8")
-    pairs = parse_links(raw)
-
-    results = []
-    for p in pairs:
-        r = check_url(p["url"])
-        results.append({**p, **r})
-
-    # Write cleaned text back, preserving order and improving clarity
-    lines_out = []
-    for r in results:
-        status = "OK" if r["ok"] else f"BAD ({r['status']})"
-        lines_out.append(f"{r['title']}\n{r['final_url']}\nStatus: {status}\n")
-    LINKS_PATH.write_text("\n".join(lines_out).strip() + "\n", encoding="utf-8")
-
-    # Also emit structured JSON for use in the site
+        links = json.loads((path or OUTPUT_JSON).read_text(encoding="utf-8")).get("links", [])
+    except (OSError, ValueError):
+        return {}
+    keys = ("ok", "status", "final_url", "error", "checkedAt")
+    return {l["url"]: {k: l[k] for k in keys if k in l} for l in links if l.get("url") and l.get("ok") is True}
+
+
+def main(argv=None, sess=None, cache=None):
+    """Command-line entry point; `mpg.py` passes its shared session and HTTP cache."""
+    parser = argparse.ArgumentParser(description="Verify links and write links.json")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="global concurrency cap")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT, help="concurrent requests per host")
+    parser.add_argument("--deadline", type=float, default=DEADLINE, help="overall time budget in seconds (0 = none)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and don't update the HTTP cache")
+    parser.add_argument("--refresh", action="store_true", help="revalidate every cached link, even fresh ones")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only check URLs that are new, changed or failing since the last links.json")
+    args = parser.parse_args(argv)
+    tracer = perf_trace.start("verify_and_update_links")
+    if cache is None or args.no_cache:
+        cache = HttpCache(enabled=not args.no_cache)
+
+    with tracer.stage("parse"):
+        raw = LINKS_PATH.read_text(encoding="utf-8")
+        tracer.count_bytes(read=len(raw.encode("utf-8")))
+        doc = parse_link_file(raw)
+        entries = doc["entries"]
+
+    previous = load_previous_results() if args.incremental else {}
+    to_check = [e["url"] for e in entries if e["url"] not in previous]
+    with tracer.stage("check", workers=args.workers, urls=len(to_check), reused=len(entries) - len(to_check)):
+        checked = check_urls(to_check, workers=args.workers,
+                             per_host=args.per_host, deadline_s=args.deadline,
+                             sess=sess, cache=cache, refresh=args.refresh)
+        cache.save()
     now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    OUTPUT_JSON.write_text(json.dumps({"updatedAt": now, "links": results}, indent=2), encoding="utf-8")
+    for res in checked.values():
+        res["checkedAt"] = now
+    checked = {**previous, **checked}
+    results = [{"title": e["title"], "url": e["url"], **checked[e["url"]]} for e in entries]
+
+    with tracer.stage("write"):
+        # Same file back with only the status lines updated; titles and layout are untouched
+        text_out = render_link_file(doc, {i: status_text(r) for i, r in enumerate(results)})
+        if text_out != raw:
+            LINKS_PATH.write_text(text_out, encoding="utf-8")
+
+        # Also emit structured JSON for use in the site
+        json_out = json.dumps({"updatedAt": now, "links": results}, indent=2)
+        OUTPUT_JSON.write_text(json_out, encoding="utf-8")
+        tracer.count_bytes(written=len(text_out.encode("utf-8")) + len(json_out.encode("utf-8")))
 
-    print("Processed", len(results), "links")
+    print("Processed", len(results), "links" + (f" ({len(to_check)} checked)" if args.incremental else ""))
     bad = [r for r in results if not r["ok"]]
     if bad:
         print("WARNING: ", len(bad), "links failed HTTP 200")
         for b in bad:
-            print("-", b["title"], "=>", b.get("status"), b.get("error", ""))
+            print("-", b["title"] or b["url"], "=>", b.get("status"), b.get("error", ""))
+    perf_trace.finish()
 
 
 if __name__ == "__main__":
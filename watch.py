@@ -0,0 +1,469 @@
+"""Watch mode for mpg.py: targeted rebuilds on change plus a live-reload dev server.
+
+    python mpg.py --watch                # http://127.0.0.1:8000, inotify where available
+    python mpg.py --watch --port 9000 --poll
+
+Changed paths are collected until the tree has been quiet for DEBOUNCE_S, then
+mapped to the stages they affect:
+
+    cover image           covers (manifest-skipped, so only changed covers are
+                          re-encoded), plus cover index and discography when a
+                          cover is added
+    deleted cover         drop its manifest entry, cover index, discography
+    link file             links --incremental, discography
+    links.json, events    discography
+    Moneyprinterg/        nothing; the dist sync reprocesses only changed assets
+    project docs          build --incremental
+
+Every batch ends with an incremental sync into dist/site. Browsers connected
+to the dev server reload when the sync changed something.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+DEBOUNCE_S = 0.1  # quiet period that ends a burst of changes
+MAX_BATCH_S = 1.0  # never hold a burst longer than this
+POLL_INTERVAL_S = 0.25
+RELOAD_PATH = "/__mpg/reload"
+HEARTBEAT_S = 15
+RELOAD_SNIPPET = (b'<script>new EventSource("' + RELOAD_PATH.encode("ascii")
+                  + b'").onmessage=function(){location.reload()}</script>')
+# Written by the cover tools themselves; never a reason to rebuild
+COVER_SKIP_DIRS = {"_backup_originals", "_backup_resized_originals", "_variants"}
+COVER_IMAGE_EXTS = {".png", ".jpg", ".jpeg"}
+# Editor swap/backup files and atomic-save temporaries
+IGNORED_SUFFIXES = (".swp", ".swx", ".tmp", "~")
+ACTION_ORDER = ("links", "forget_covers", "covers", "cover_index", "discography", "build", "sync")
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    _libc.inotify_init1
+    HAS_INOTIFY = sys.platform.startswith("linux")
+except (OSError, AttributeError, TypeError):
+    HAS_INOTIFY = False
+
+
+def _skipped_dir(path):
+    return path.name in COVER_SKIP_DIRS or path.name.startswith(".")
+
+
+class InotifyWatcher:
+    """Recursive inotify watches; directories created later are picked up as they appear."""
+
+    def __init__(self, trees, dirs):
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}
+        for d in dirs:
+            self._add(d)
+        for tree in trees:
+            self._add_tree(tree)
+
+    def _add(self, path):
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.paths[wd] = Path(path)
+
+    def _add_tree(self, root):
+        if not root.is_dir():
+            return
+        self._add(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not _skipped_dir(Path(d))]
+            for d in dirnames:
+                self._add(Path(dirpath) / d)
+
+    def poll(self, timeout):
+        """Changes available within `timeout` seconds (None blocks): [(kind, path)]."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changes = []
+        off = 0
+        while off < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, off)
+            name = buf[off + _EVENT.size:off + _EVENT.size + length].rstrip(b"\0")
+            off += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                changes.append(("overflow", None))
+                continue
+            base = self.paths.get(wd)
+            if base is None or not name:
+                continue
+            path = base / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not _skipped_dir(path):
+                    self._add_tree(path)
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.append(("deleted", path))
+            elif mask & IN_CREATE:
+                changes.append(("created", path))
+            elif mask & IN_MOVED_TO:
+                # New or replacing an existing file; only the Rebuilder knows which
+                changes.append(("moved", path))
+            else:
+                changes.append(("modified", path))
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback: compare size/mtime snapshots every POLL_INTERVAL_S."""
+
+    def __init__(self, trees, dirs, interval=POLL_INTERVAL_S):
+        self.trees = list(trees)
+        self.dirs = list(dirs)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snap = {}
+
+        def add(p):
+            try:
+                st = p.stat()
+            except OSError:
+                return
+            snap[p] = (st.st_mtime_ns, st.st_size)
+
+        for d in self.dirs:
+            if d.is_dir():
+                for p in d.iterdir():
+                    if p.is_file():
+                        add(p)
+        for tree in self.trees:
+            for dirpath, dirnames, filenames in os.walk(tree):
+                dirnames[:] = [d for d in dirnames if not _skipped_dir(Path(d))]
+                for f in filenames:
+                    add(Path(dirpath) / f)
+        return snap
+
+    def poll(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snap = self._scan()
+            old, self.snapshot = self.snapshot, snap
+            changes = [("deleted", p) for p in old.keys() - snap.keys()]
+            changes += [("created", p) for p in snap.keys() - old.keys()]
+            changes += [("modified", p) for p in snap.keys() & old.keys() if snap[p] != old[p]]
+            if changes:
+                return changes
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+
+def make_watcher(trees, dirs, poll=False):
+    if HAS_INOTIFY and not poll:
+        try:
+            return InotifyWatcher(trees, dirs)
+        except OSError as e:
+            # e.g. the inotify watch limit is exhausted
+            print(f"[watch] inotify unavailable ({errno.errorcode.get(e.errno, e)}); polling instead")
+    return PollingWatcher(trees, dirs)
+
+
+def next_batch(watcher, debounce=DEBOUNCE_S, max_wait=MAX_BATCH_S):
+    """Block for the first change, then gather the rest of the burst: {path: kind}."""
+    changes = watcher.poll(None)
+    deadline = time.monotonic() + max_wait
+    while True:
+        left = deadline - time.monotonic()
+        more = watcher.poll(min(debounce, left)) if left > 0 else []
+        if not more:
+            break
+        changes += more
+    batch = {}
+    for kind, path in changes:
+        prev = batch.get(path)
+        if prev in ("created", "moved") and kind == "modified":
+            continue  # still new
+        if prev == "deleted" and kind in ("created", "moved"):
+            kind = "modified"  # atomic save: unlink or rename over the old file
+        batch[path] = kind
+    return batch
+
+
+class Rebuilder:
+    """Maps changed paths to stages and runs only those, using mpg's shared pool and HTTP session."""
+
+    def __init__(self, shared):
+        self.shared = shared
+        config = shared.config
+        self.covers = config.path_for("covers")
+        self.site = config.path_for("site")
+        self.site_data = config.path_for("site_data")
+        self.link_file = config.path_for("link_file")
+        self.discography_inputs = {config.path_for("links_json"), config.path_for("events")}
+        self.build_inputs = {config.path_for("project_doc"), config.path_for("team_bundle")}
+        self.sync_inputs = {config.path_for("discography")}
+        self.written = {}
+        self.removed = set()
+        self.deleted_covers = []
+
+    def watch_roots(self):
+        """(trees watched recursively, directories watched for their own files)."""
+        files = {self.link_file} | self.discography_inputs | self.build_inputs | self.sync_inputs
+        return [self.covers, self.site, self.site_data], sorted({p.parent for p in files})
+
+    def remember_outputs(self):
+        # Our own writes show up as changes too; a path whose size/mtime still
+        # matches what the last rebuild left behind, or that the rebuild deleted,
+        # is not a new edit
+        paths = [self.link_file, *self.discography_inputs, *self.sync_inputs]
+        if self.covers.is_dir():
+            paths += [p for p in self.covers.iterdir() if p.is_file()]
+        if self.site_data.is_dir():
+            paths += [p for p in self.site_data.rglob("*") if p.is_file()]
+        written = {}
+        for p in paths:
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            written[p] = (st.st_mtime_ns, st.st_size)
+        self.removed = self.written.keys() - written.keys()
+        self.written = written
+
+    def _self_written(self, path, kind):
+        if kind == "deleted":
+            return path in self.removed
+        if path not in self.written:
+            return False
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        return self.written[path] == (st.st_mtime_ns, st.st_size)
+
+    def actions_for(self, path, kind):
+        if path is None:  # event queue overflowed: assume anything changed
+            return {"covers", "discography", "build"}
+        if kind == "moved":
+            # Renamed into place: over a file we know, or a new one
+            kind = "modified" if path in self.written else "created"
+        if path.name.endswith(IGNORED_SUFFIXES) or self._self_written(path, kind):
+            return set()
+        if path == self.link_file:
+            return {"links", "discography"}
+        if path in self.discography_inputs:
+            return {"discography"}
+        if path in self.build_inputs:
+            return {"build"}
+        if path in self.sync_inputs:
+            return {"sync"}
+        if self.covers in path.parents:
+            rel = path.relative_to(self.covers)
+            if rel.parts[0] in COVER_SKIP_DIRS or path.suffix.lower() not in COVER_IMAGE_EXTS:
+                return set()
+            if kind == "modified":
+                return {"covers"}
+            if kind == "deleted":
+                # Nothing to encode: forget it and rebuild what lists the covers
+                return {"forget_covers", "cover_index", "discography"}
+            # The track list follows the covers
+            return {"covers", "cover_index", "discography"}
+        if self.site in path.parents or self.site_data in path.parents:
+            return {"sync"}
+        return set()
+
+    def plan(self, batch):
+        """(stages to run in order, paths that called for them)."""
+        actions, triggers = set(), []
+        for path, kind in batch.items():
+            needed = self.actions_for(path, kind)
+            if "forget_covers" in needed:
+                self.deleted_covers.append(path)
+            if needed:
+                actions |= needed
+                triggers.append(path)
+        if not actions:
+            return [], []
+        # The incremental build ends with the same dist sync
+        actions.add("sync" if "build" not in actions else "build")
+        return [a for a in ACTION_ORDER if a in actions], triggers
+
+    def run(self, actions):
+        """Run the planned stages in order; returns True if dist/site changed."""
+        changed = False
+        for action in actions:
+            changed |= bool(getattr(self, "_" + action)())
+        return changed
+
+    def _links(self):
+        import verify_and_update_links
+        sess, cache = self.shared.http()
+        verify_and_update_links.main(["--incremental"], sess=sess, cache=cache)
+
+    def _forget_covers(self):
+        from cover_cache import MANIFEST_NAME, CoverManifest
+        manifest = CoverManifest(self.covers / MANIFEST_NAME)
+        for path in self.deleted_covers:
+            manifest.forget(str(path.relative_to(self.covers)))
+        manifest.save()
+        self.deleted_covers = []
+
+    def _covers(self):
+        import mpg
+        mpg.run_covers(self.shared)
+
+    def _cover_index(self):
+        import cover_index
+        if cover_index.HAS_NUMPY:
+            cover_index.build_index()
+
+    def _discography(self):
+        import mpg
+        mpg.run_discography(self.shared)
+
+    def _build(self):
+        import build
+        build.main(["--incremental"])
+        return True
+
+    def _sync(self):
+        import build
+        state = build.BuildState()
+        stats = build.copy_to_dist(state, incremental=True)
+        state.save()
+        return stats["copied"] or stats["removed"] or stats["assets_built"]
+
+
+class DevHandler(SimpleHTTPRequestHandler):
+    """Static files from dist/site; HTML gets the live-reload snippet, /__mpg/reload is the event stream."""
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+    def do_GET(self):
+        url = urlsplit(self.path).path
+        if url == RELOAD_PATH:
+            return self._event_stream()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and url.endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            return self._send_html(path)
+        return super().do_GET()
+
+    def _send_html(self, path):
+        with open(path, "rb") as f:
+            body = f.read()
+        i = body.lower().rfind(b"</body>")
+        body = body[:i] + RELOAD_SNIPPET + body[i:] if i >= 0 else body + RELOAD_SNIPPET
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _event_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        server = self.server
+        seen = server.generation
+        try:
+            while True:
+                with server.changed:
+                    server.changed.wait_for(lambda: server.generation != seen, timeout=HEARTBEAT_S)
+                    current = server.generation
+                self.wfile.write(b"data: reload\n\n" if current != seen else b": ping\n\n")
+                self.wfile.flush()
+                seen = current
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class DevServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, host="127.0.0.1", port=8000):
+        handler = lambda *a, **kw: DevHandler(*a, directory=str(directory), **kw)  # noqa: E731
+        super().__init__((host, port), handler)
+        self.generation = 0
+        self.changed = threading.Condition()
+
+    def reload(self):
+        with self.changed:
+            self.generation += 1
+            self.changed.notify_all()
+
+
+def run(shared, port=8000, host="127.0.0.1", poll=False, serve=True):
+    """Bring dist/ up to date, then rebuild on every change until interrupted."""
+    import build
+    rebuilder = Rebuilder(shared)
+    build.main(["--incremental"])
+    rebuilder.remember_outputs()
+    trees, dirs = rebuilder.watch_roots()
+    watcher = make_watcher(trees, dirs, poll)
+    server = None
+    if serve:
+        server = DevServer(build.DIST_DIR / "site", host, port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[watch] serving {build.DIST_DIR / 'site'} at http://{host}:{server.server_address[1]}/")
+    print(f"[watch] watching with {type(watcher).__name__}; Ctrl+C to stop")
+    try:
+        while True:
+            batch = next_batch(watcher)
+            actions, triggers = rebuilder.plan(batch)
+            if not actions:
+                continue
+            t0 = time.perf_counter()
+            names = sorted(p.name for p in triggers if p is not None) or ["event queue overflow"]
+            names = ", ".join(names[:3]) + (f" (+{len(names) - 3})" if len(names) > 3 else "")
+            try:
+                changed = rebuilder.run(actions)
+            except (Exception, SystemExit) as e:
+                print(f"[watch] {names}: {' -> '.join(actions)} failed: {e}")
+                continue
+            finally:
+                rebuilder.remember_outputs()
+            print(f"[watch] {names}: {' -> '.join(actions)} in {time.perf_counter() - t0:.2f}s")
+            if changed and server:
+                server.reload()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if server:
+            server.shutdown()
+            server.server_close()